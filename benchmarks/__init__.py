@@ -0,0 +1,61 @@
+"""
+Performance benchmarks for the vault, run with ``manage.py vault_bench``.
+
+Each module exposes ``run(options)``, which yields ``Result`` tuples. Runs can be saved to JSON and compared
+against a saved baseline to catch regressions.
+"""
+import json
+import time
+from collections import namedtuple
+
+Result = namedtuple('Result', ['name', 'value', 'unit', 'higher_is_better'])
+
+SUITES = ['crypto', 'writes', 'changelist']
+
+
+def rate(func, operations):
+    """
+    Run ``func`` once and return how many of its ``operations`` it got through per second.
+    """
+    start = time.perf_counter()
+    func()
+
+    return operations / (time.perf_counter() - start)
+
+
+def median_time(func, repeat):
+    timings = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    return sorted(timings)[len(timings) // 2]
+
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump({result.name: result._asdict() for result in results}, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return {name: Result(**result) for name, result in json.load(f).items()}
+
+
+def regressions(results, baseline, threshold):
+    """
+    Yield ``(result, baseline result, change)`` for each result at least ``threshold`` (a fraction) worse than the
+    baseline. Results missing from the baseline are not compared.
+    """
+    for result in results:
+        before = baseline.get(result.name)
+
+        if not before or not before.value:
+            continue
+
+        change = (result.value - before.value) / before.value
+
+        if (-change if result.higher_is_better else change) > threshold:
+            yield result, before, change
@@ -0,0 +1,68 @@
+import itertools
+import time
+
+from django.contrib import admin
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from faker import Factory
+
+from benchmarks import Result, median_time
+from vault.models import User, Team, Credential
+
+OWNERS = 50
+
+
+def seed(size, owners, team, faker):
+    """
+    Top the credentials up to ``size`` rows, one in ten shared with ``team``.
+    """
+    names = itertools.cycle([faker.name() for _ in range(1000)])
+    start = Credential.objects.count()
+
+    Credential.objects.bulk_create_encrypted(
+        Credential(owner=owners[i % len(owners)], team=team if i % 10 == 0 else None, name=next(names),
+                   username='bench', password='secret')
+        for i in range(start, size))
+
+
+def run(options):
+    faker = Factory.create()
+    faker.seed_instance(0)
+    model_admin = admin.site._registry[Credential]
+    factory = RequestFactory()
+
+    superuser = User.objects.create_superuser(email='bench-superuser@example.com', password=None)
+    member = User.objects.create_user(email='bench-member@example.com', is_staff=True)
+    member.user_permissions.set(Permission.objects.filter(codename__in=['view_credential', 'change_credential']))
+    owners = [User.objects.create(email=f'bench-owner-{i}@example.com') for i in range(OWNERS)]
+    team = Team.objects.create(owner=owners[0], name='bench-team')
+    team.members.add(member)
+
+    def changelist(user):
+        request = factory.get('/vault/credential/')
+        request.user = user
+        model_admin.changelist_view(request).render()
+
+    for size in options['sizes']:
+        seed(size, owners, team, faker)
+
+        for role, user in [('superuser', superuser), ('member', member)]:
+            name = f'changelist_{size}_{role}'
+            cache.clear()
+
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                changelist(user)
+                cold = time.perf_counter() - start
+
+            yield Result(f'{name}_cold', cold * 1000, 'ms', False)
+            yield Result(f'{name}_cold_queries', len(queries), 'queries', False)
+
+            with CaptureQueriesContext(connection) as queries:
+                changelist(user)
+
+            yield Result(name, median_time(lambda: changelist(user), options['repeat']) * 1000, 'ms', False)
+            yield Result(f'{name}_queries', len(queries), 'queries', False)
@@ -0,0 +1,26 @@
+from faker import Factory
+
+from benchmarks import Result, rate
+from vault.helpers import decrypt_value, decrypt_values, encrypt_value, encrypt_values
+from vault.keyring import clear_keyring_cache, get_keyring
+
+
+def run(options):
+    faker = Factory.create()
+    faker.seed_instance(0)
+    operations = options['operations']
+    values = [faker.password(length=16) for _ in range(operations)]
+    tokens = [encrypt_value(value) for value in values]
+
+    yield Result('encrypt_value', rate(lambda: [encrypt_value(value) for value in values], operations),
+                 'ops/sec', True)
+    yield Result('decrypt_value', rate(lambda: [decrypt_value(token) for token in tokens], operations),
+                 'ops/sec', True)
+    yield Result('encrypt_values', rate(lambda: list(encrypt_values(values)), operations), 'ops/sec', True)
+    yield Result('decrypt_values', rate(lambda: list(decrypt_values(tokens)), operations), 'ops/sec', True)
+
+    def derive():
+        clear_keyring_cache()
+        get_keyring()
+
+    yield Result('key_derivation', rate(lambda: [derive() for _ in range(5)], 5), 'ops/sec', True)
@@ -0,0 +1,25 @@
+from benchmarks import Result, rate
+from vault.keyring import clear_keyring_cache
+from vault.models import User, Credential
+
+
+def run(options):
+    writes = options['writes']
+    owner = User.objects.create(email='bench-writes@example.com')
+
+    def save(cached):
+        clear_keyring_cache()
+
+        for i in range(writes):
+            if not cached:
+                clear_keyring_cache()
+
+            Credential.objects.create(owner=owner, name=f'bench-{i}', username='bench', password='secret')
+
+    def bulk_create():
+        Credential.objects.bulk_create_encrypted(
+            Credential(owner=owner, name=f'bulk-{i}', username='bench', password='secret') for i in range(writes * 10))
+
+    yield Result('credential_save_uncached_key', rate(lambda: save(cached=False), writes), 'writes/sec', True)
+    yield Result('credential_save', rate(lambda: save(cached=True), writes), 'writes/sec', True)
+    yield Result('credential_bulk_create_encrypted', rate(bulk_create, writes * 10), 'writes/sec', True)
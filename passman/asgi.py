@@ -0,0 +1,18 @@
+"""
+ASGI config for passman project.
+
+It exposes the ASGI callable as a module-level variable named ``application``, which also serves the async secret
+lookups under /api/async/. Serve it with, for example,
+``gunicorn passman.asgi:application -k uvicorn.workers.UvicornWorker``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'passman.settings')
+
+application = get_asgi_application()
@@ -14,8 +14,12 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
+
+from vault.metrics import metrics_view
 
 urlpatterns = [
+    path('api/', include('vault.urls')),
+    path('metrics', metrics_view, name='metrics'),
     path('', admin.site.urls),
 ]
@@ -1,15 +1,151 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.utils import unquote
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
 from django.contrib.auth.admin import UserAdmin
-from django.db.models import Q
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
 from django.utils.translation import ugettext_lazy as _
 
+from vault import search
+from vault.importers import PARSERS, ImportFormatError, detect_format, import_credentials
+from vault.middleware import get_team_membership
 from vault.models import User, Team, Credential, SecureNote
+from vault.pagination import AFTER_VAR, BEFORE_VAR, CURSOR_VARS, KeysetPaginator, decode_cursor, encode_cursor
+from vault.profiler import SORT_KEYS, get_profile_store
 
 admin.site.site_header = _('Passman Admin Panel')
 admin.site.site_title = _('Passman Admin Panel')
 admin.site.index_title = _('Dashboard')
 
 
+class SecretAdminForm(forms.ModelForm):
+    """
+    Shows the plaintext of the edited object's secret, decrypting it only once a field actually asks for it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(SecretAdminForm, self).__init__(*args, **kwargs)
+        field = self._meta.model.secret_field
+
+        # The ciphertext as loaded, since saving the instance replaces it before changed_data compares with it.
+        self.stored_secret = self.instance.stored_secret
+
+        if self.instance.pk and field in self.fields:
+            # Django calls callable initial values when a bound field first reads them.
+            self.initial[field] = self.get_decrypted_secret
+
+    def get_decrypted_secret(self):
+        return self.instance.decrypt_secret(self.stored_secret).decode()
+
+
+class CredentialImportForm(forms.Form):
+    file = forms.FileField(label=_('file'))
+    format = forms.ChoiceField(label=_('format'), required=False,
+                               choices=[('', _('Guess from the file name'))] + [(name, name) for name in PARSERS])
+    team = forms.ModelChoiceField(label=_('team'), queryset=Team.objects.none(), required=False)
+
+    def __init__(self, *args, team_ids=(), **kwargs):
+        super(CredentialImportForm, self).__init__(*args, **kwargs)
+        self.fields['team'].queryset = Team.objects.filter(pk__in=team_ids)
+
+
+class SecretAdminMixin:
+    """
+    Decrypts secrets on demand: through ``SecretAdminForm`` when the change form renders them, and through the
+    ``reveal/`` view for pages that only show them masked. Saves decrypt the stored secret once, to tell whether it
+    was edited; deletes and history pages never decrypt.
+    """
+    form = SecretAdminForm
+
+    def get_fieldsets(self, request, obj=None):
+        fieldsets = super(SecretAdminMixin, self).get_fieldsets(request, obj)
+
+        if obj is None or self.has_change_permission(request, obj):
+            return fieldsets
+
+        secret_field = self.model.secret_field
+
+        return [[name, dict(options, fields=['masked_secret' if field == secret_field else field
+                                             for field in options['fields']])]
+                for name, options in fieldsets]
+
+    def masked_secret(self, obj):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        url = reverse('admin:%s_%s_reveal' % info, args=[obj.pk], current_app=self.admin_site.name)
+
+        return format_html('<span class="masked-secret" data-reveal-url="{}">********</span>', url)
+
+    masked_secret.short_description = _('secret')
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+
+        return [
+            path('<path:object_id>/reveal/', self.admin_site.admin_view(self.reveal_view),
+                 name='%s_%s_reveal' % info),
+        ] + super(SecretAdminMixin, self).get_urls()
+
+    def reveal_view(self, request, object_id):
+        obj = self.get_object(request, unquote(object_id))
+
+        if obj is None or not self.has_view_or_change_permission(request, obj):
+            raise Http404
+
+        secret_field = self.model.secret_field
+
+        return JsonResponse({secret_field: getattr(obj, f'decrypted_{secret_field}').decode()})
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Changelist whose links to the pages next to the current one carry a cursor, ``after`` its last row or ``before``
+    its first, so following them seeks whichever process serves them and however long ago the page was read.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super(KeysetChangeList, self).get_filters_params(params)
+
+        for name in CURSOR_VARS:
+            lookup_params.pop(name, None)
+
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # A cursor only holds for the page it leads to; every other link drops it.
+        new_params = dict({name: None for name in CURSOR_VARS}, **(new_params or {}))
+        number = new_params.get(PAGE_VAR)
+        paginator = getattr(self, 'paginator', None)
+        rows = getattr(self, 'result_list', None)
+
+        if paginator is not None and paginator.keyset_ordered and isinstance(rows, list) and rows:
+            if number == self.page_num + 1:
+                new_params[AFTER_VAR] = encode_cursor(rows[-1])
+            elif number == self.page_num - 1 and number > 1:
+                new_params[BEFORE_VAR] = encode_cursor(rows[0])
+
+        return super(KeysetChangeList, self).get_query_string(new_params, remove)
+
+
+class KeysetPaginationMixin:
+    """
+    Paginate a ``ModelAdmin`` ordered by ``KeysetPaginator.keyset`` with seeks rather than OFFSET.
+    """
+    paginator = KeysetPaginator
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return self.paginator(queryset, per_page, orphans, allow_empty_first_page,
+                              after=decode_cursor(request.GET.get(AFTER_VAR)),
+                              before=decode_cursor(request.GET.get(BEFORE_VAR)))
+
+
 @admin.register(User)
 class UserAdmin(UserAdmin):
     date_hierarchy = 'date_joined'
@@ -32,11 +168,82 @@ class UserAdmin(UserAdmin):
     search_fields = ['first_name', 'last_name', 'email']
     ordering = ['email']
 
+    def get_fieldsets(self, request, obj=None):
+        fieldsets = super(UserAdmin, self).get_fieldsets(request, obj)
+
+        if obj and request.user.is_superuser:
+            fieldsets = list(fieldsets) + [[_('Diagnostics'), {'fields': ['profile_requests']}]]
+
+        return fieldsets
+
+    def get_urls(self):
+        return [
+            path('profiles/', self.admin_site.admin_view(self.profiles_view), name='vault_user_profiles'),
+            path('profiles/<str:profile_id>/', self.admin_site.admin_view(self.profile_view),
+                 name='vault_user_profile'),
+            path('profiles/<str:profile_id>/download/', self.admin_site.admin_view(self.profile_download_view),
+                 name='vault_user_profile_download'),
+        ] + super(UserAdmin, self).get_urls()
+
+    def get_profile_store(self, request):
+        if not request.user.is_superuser:
+            raise PermissionDenied
+
+        store = get_profile_store()
+
+        if store is None:
+            raise Http404(_('Profiling is off; set VAULT_PROFILER_DIR to turn it on.'))
+
+        return store
+
+    def get_profile(self, store, profile_id):
+        profile = store.get(profile_id)
+
+        if profile is None:
+            raise Http404
+
+        return profile
+
+    def profiles_context(self, request, **kwargs):
+        return dict(self.admin_site.each_context(request), opts=self.model._meta, **kwargs)
+
+    def profiles_view(self, request):
+        store = self.get_profile_store(request)
+        context = self.profiles_context(request, profiles=store.entries(), keep=store.keep,
+                                        title=_('Request profiles'))
+
+        return TemplateResponse(request, 'admin/vault/user/profiles.html', context)
+
+    def profile_view(self, request, profile_id):
+        store = self.get_profile_store(request)
+        profile = self.get_profile(store, profile_id)
+        sort = request.GET.get('sort')
+
+        if sort not in SORT_KEYS:
+            sort = SORT_KEYS[0]
+
+        context = self.profiles_context(request, profile=profile, sort=sort, sort_keys=SORT_KEYS,
+                                        report=store.report(profile_id, sort),
+                                        title=_('Profile of %s') % profile['path'])
+
+        return TemplateResponse(request, 'admin/vault/user/profile.html', context)
+
+    def profile_download_view(self, request, profile_id):
+        store = self.get_profile_store(request)
+        self.get_profile(store, profile_id)
+
+        try:
+            return FileResponse(open(store.path(profile_id), 'rb'), as_attachment=True,
+                                filename=f'{profile_id}.prof')
+        except FileNotFoundError:
+            raise Http404
+
 
 @admin.register(Team)
 class TeamAdmin(admin.ModelAdmin):
     fields = ['owner', 'name', 'members']
     list_display = ['name', 'owner']
+    list_select_related = ['owner']
     search_fields = ['name']
 
     def get_queryset(self, request):
@@ -47,6 +254,43 @@ class TeamAdmin(admin.ModelAdmin):
 
         return qs
 
+    def get_team_picker_model(self, request):
+        """
+        The model whose team picker the request is searching for, if it is a team picker request of the admin
+        autocomplete view.
+        """
+        if not request.resolver_match or request.resolver_match.url_name != 'autocomplete':
+            return None
+
+        model_name = request.GET.get('model_name')
+
+        if request.GET.get('app_label') != 'vault' or request.GET.get('field_name') != 'team' or \
+                model_name not in ['credential', 'securenote']:
+            return None
+
+        return model_name
+
+    def is_team_picker(self, request):
+        return self.get_team_picker_model(request) is not None
+
+    def has_view_permission(self, request, obj=None):
+        # The team pickers of credentials and secure notes are searched through this admin, so whoever may fill one
+        # in may search the teams, even without any permission on teams themselves.
+        model_name = self.get_team_picker_model(request)
+
+        if model_name and any(request.user.has_perm(f'vault.{action}_{model_name}') for action in ['add', 'change']):
+            return True
+
+        return super(TeamAdmin, self).has_view_permission(request, obj)
+
+    def get_search_results(self, request, queryset, search_term):
+        # The team pickers of credentials and secure notes offer every team the user owns or belongs to, not only
+        # the owned ones this admin lists.
+        if self.is_team_picker(request):
+            queryset = Team.objects.filter(pk__in=get_team_membership(request).team_ids).order_by('name')
+
+        return super(TeamAdmin, self).get_search_results(request, queryset, search_term)
+
     def get_readonly_fields(self, request, obj=None):
         self.readonly_fields = []
 
@@ -63,30 +307,33 @@ class TeamAdmin(admin.ModelAdmin):
 
 
 @admin.register(Credential)
-class CredentialAdmin(admin.ModelAdmin):
+class CredentialAdmin(SecretAdminMixin, KeysetPaginationMixin, admin.ModelAdmin):
     date_hierarchy = 'date_created'
     fieldsets = [
         [None, {'fields': ['owner', 'team', 'name', 'username', 'password', 'url']}],
         [_('Important dates'), {'fields': ['date_created']}],
     ]
     list_display = ['name', 'owner', 'team', 'date_created']
+    list_select_related = ['owner', 'team']
+    autocomplete_fields = ['team']
     list_filter = ['owner']
+    ordering = ['-date_created', '-id']
+    show_full_result_count = False
     search_fields = ['name', 'owner__first_name', 'owner__last_name', 'owner__email']
 
     def get_queryset(self, request):
         qs = super(CredentialAdmin, self).get_queryset(request)
 
-        if not request.user.is_superuser:
-            return qs.filter(
-                Q(owner=request.user) | Q(team__owner=request.user) | Q(team__in=request.user.team_set.all()))
+        return qs.visible_to(request.user)
 
-        return qs
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'team':
+            kwargs['queryset'] = Team.objects.filter(pk__in=get_team_membership(request).team_ids)
+
+        return super(CredentialAdmin, self).formfield_for_foreignkey(db_field, request, **kwargs)
 
-    def render_change_form(self, request, context, *args, **kwargs):
-        if 'team' not in self.readonly_fields:
-            context['adminform'].form.fields['team'].queryset = Team.objects.filter(
-                Q(owner=request.user) | Q(members__in=[request.user])).distinct()
-        return super(CredentialAdmin, self).render_change_form(request, context, *args, **kwargs)
+    def get_search_results(self, request, queryset, search_term):
+        return search.search(queryset, search_term), False
 
     def get_readonly_fields(self, request, obj=None):
         self.readonly_fields = ['date_created']
@@ -94,23 +341,54 @@ class CredentialAdmin(admin.ModelAdmin):
         if obj or not request.user.is_superuser:
             self.readonly_fields.insert(0, 'owner')
 
-        if obj and not request.user == obj.owner:
+        if obj and not request.user.pk == obj.owner_id:
             self.readonly_fields.insert(0, 'team')
 
         return self.readonly_fields
 
-    def get_object(self, request, object_id, from_field=None):
-        obj = super(CredentialAdmin, self).get_object(request, object_id, from_field)
-        obj.password = obj.decrypted_password.decode()
-
-        return obj
-
     def save_model(self, request, obj, form, change):
         if not request.user.is_superuser:
             obj.owner = request.user
 
         super(CredentialAdmin, self).save_model(request, obj, form, change)
 
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='vault_credential_import'),
+        ] + super(CredentialAdmin, self).get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        form = CredentialImportForm(request.POST or None, request.FILES or None,
+                                    team_ids=get_team_membership(request).team_ids)
+
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+
+            try:
+                parse = PARSERS[form.cleaned_data['format'] or detect_format(upload.name)]
+                created, errors = import_credentials(parse(upload.file), request.user, form.cleaned_data['team'])
+            except ImportFormatError as e:
+                form.add_error('file', str(e))
+            else:
+                self.message_user(request, _('Imported %d credentials.') % created, messages.SUCCESS)
+
+                for number, error_messages in errors[:10]:
+                    self.message_user(request, _('Skipped entry %(number)d: %(errors)s') % {
+                        'number': number, 'errors': '; '.join(error_messages)}, messages.WARNING)
+
+                if len(errors) > 10:
+                    self.message_user(request, _('Skipped %d more entries.') % (len(errors) - 10), messages.WARNING)
+
+                return redirect('admin:vault_credential_changelist')
+
+        context = dict(self.admin_site.each_context(request), form=form, opts=self.model._meta,
+                       title=_('Import credentials'))
+
+        return TemplateResponse(request, 'admin/vault/credential/import.html', context)
+
     class Media:
         css = {
             'all': ['css/show_password.css']
@@ -119,29 +397,33 @@ class CredentialAdmin(admin.ModelAdmin):
 
 
 @admin.register(SecureNote)
-class SecureNoteAdmin(admin.ModelAdmin):
+class SecureNoteAdmin(SecretAdminMixin, KeysetPaginationMixin, admin.ModelAdmin):
     date_hierarchy = 'date_created'
     fieldsets = [
         [None, {'fields': ['owner', 'team', 'title', 'note']}],
         [_('Important dates'), {'fields': ['date_created']}],
     ]
     list_display = ['title', 'owner', 'team', 'date_created']
+    list_select_related = ['owner', 'team']
+    autocomplete_fields = ['team']
     list_filter = ['owner']
+    ordering = ['-date_created', '-id']
+    show_full_result_count = False
     search_fields = ['title', 'owner__first_name', 'owner__last_name', 'owner__email']
 
     def get_queryset(self, request):
         qs = super(SecureNoteAdmin, self).get_queryset(request)
 
-        if not request.user.is_superuser:
-            return qs.filter(Q(owner=request.user) | Q(team__in=request.user.team_set.all()))
+        return qs.visible_to(request.user)
 
-        return qs
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'team':
+            kwargs['queryset'] = Team.objects.filter(pk__in=get_team_membership(request).team_ids)
+
+        return super(SecureNoteAdmin, self).formfield_for_foreignkey(db_field, request, **kwargs)
 
-    def render_change_form(self, request, context, *args, **kwargs):
-        if 'team' not in self.readonly_fields:
-            context['adminform'].form.fields['team'].queryset = Team.objects.filter(
-                Q(owner=request.user) | Q(members__in=[request.user])).distinct()
-        return super(SecureNoteAdmin, self).render_change_form(request, context, *args, **kwargs)
+    def get_search_results(self, request, queryset, search_term):
+        return search.search(queryset, search_term), False
 
     def get_readonly_fields(self, request, obj=None):
         self.readonly_fields = ['date_created']
@@ -149,19 +431,16 @@ class SecureNoteAdmin(admin.ModelAdmin):
         if obj or not request.user.is_superuser:
             self.readonly_fields.insert(0, 'owner')
 
-        if obj and not request.user == obj.owner:
+        if obj and not request.user.pk == obj.owner_id:
             self.readonly_fields.insert(0, 'team')
 
         return self.readonly_fields
 
-    def get_object(self, request, object_id, from_field=None):
-        obj = super(SecureNoteAdmin, self).get_object(request, object_id, from_field)
-        obj.note = obj.decrypted_note.decode()
-
-        return obj
-
     def save_model(self, request, obj, form, change):
         if not request.user.is_superuser:
             obj.owner = request.user
 
         super(SecureNoteAdmin, self).save_model(request, obj, form, change)
+
+    class Media:
+        js = ['js/show_password.js']
@@ -0,0 +1,349 @@
+import base64
+import binascii
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, Q, Sum
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views import View
+
+from vault.executor import CryptoExecutorBusy
+from vault.middleware import get_team_membership
+from vault.models import Team, Credential, SecureNote
+
+encoder = DjangoJSONEncoder()
+
+
+class ApiError(Exception):
+    def __init__(self, detail, status=400):
+        super(ApiError, self).__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+def basic_auth_user(request):
+    method, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+
+    if method.lower() != 'basic':
+        return None
+
+    try:
+        email, _, password = base64.b64decode(credentials).decode().partition(':')
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+
+    return authenticate(request, email=email, password=password)
+
+
+def authenticate_request(request):
+    """
+    Return the user the request is made by, through the session or HTTP Basic auth, or ``None``.
+    """
+    if request.user.is_authenticated:
+        return request.user
+
+    user = basic_auth_user(request)
+
+    if user is not None:
+        request.user = user
+
+        # The middleware looked up the memberships of the anonymous user the request came in as.
+        if hasattr(request, 'team_membership'):
+            del request.team_membership
+
+    return user
+
+
+def busy():
+    response = JsonResponse({'detail': 'The vault is busy, try again shortly.'}, status=503)
+    response['Retry-After'] = '1'
+
+    return response
+
+
+def forbidden():
+    return JsonResponse({'detail': 'You do not have permission to perform this action.'}, status=403)
+
+
+def unauthorized():
+    response = JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    response['WWW-Authenticate'] = 'Basic realm="passman"'
+
+    return response
+
+
+class ApiView(View):
+    """
+    Base of the read-only JSON views. Callers authenticate with the admin session or HTTP Basic auth, and need what
+    the admin asks for to list ``model``: staff status and its view or change permission.
+
+    ``fields`` lists what a resource can return and ``default_fields`` what it returns when the ``fields`` parameter
+    doesn't pick any; secrets are only decrypted when one of the selected fields is ``secret_field``.
+    """
+    http_method_names = ['get', 'head', 'options']
+    model = None
+    fields = []
+    default_fields = []
+    secret_field = None
+
+    def dispatch(self, request, *args, **kwargs):
+        user = authenticate_request(request)
+
+        if user is None:
+            return unauthorized()
+
+        if not self.has_permission(user):
+            return forbidden()
+
+        try:
+            return super(ApiView, self).dispatch(request, *args, **kwargs)
+        except ApiError as e:
+            return JsonResponse({'detail': e.detail}, status=e.status)
+        except CryptoExecutorBusy:
+            return busy()
+
+    def has_permission(self, user):
+        opts = self.model._meta
+
+        return user.is_staff and (user.has_perm(f'{opts.app_label}.view_{opts.model_name}') or
+                                  user.has_perm(f'{opts.app_label}.change_{opts.model_name}'))
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def get_fields(self):
+        if 'fields' not in self.request.GET:
+            return self.default_fields
+
+        fields = [field for field in self.request.GET['fields'].split(',') if field]
+        unknown = set(fields) - set(self.fields)
+
+        if unknown or not fields:
+            raise ApiError(f'Unknown fields: {", ".join(sorted(unknown))}.' if unknown else 'No fields selected.')
+
+        return fields
+
+    def get_objects(self, queryset, fields, decrypt=True):
+        queryset = queryset.only(*fields)
+
+        if decrypt and self.secret_field in fields:
+            return queryset.decrypt_iter()
+
+        return queryset.iterator()
+
+    def serialize(self, obj, fields):
+        return {field: getattr(obj, self.model._meta.get_field(field).attname) for field in fields}
+
+    def get_etag(self, *parts):
+        parts = (self.request.user.pk, self.request.get_full_path()) + parts
+
+        return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+class ListView(ApiView):
+    """
+    Stream the visible objects as ``{"results": [...], "next": <url or null>}``, oldest first.
+
+    Rows are read with ``iterator()`` and written out one by one, so memory use doesn't grow with ``limit``. The next
+    page starts after the ``cursor`` primary key given in ``next``, which stays stable as rows are added.
+    """
+
+    def get(self, request):
+        fields = self.get_fields()
+        limit = self.get_limit()
+        queryset = self.get_queryset().order_by('pk')
+
+        if 'cursor' in request.GET:
+            try:
+                queryset = queryset.filter(pk__gt=int(request.GET['cursor']))
+            except ValueError:
+                raise ApiError('Invalid cursor.')
+
+        # Any row of the page, or the one after it that decides ``next``, being saved, deleted, or made visible or
+        # invisible to the user changes at least one of these. They are computed over those rows only.
+        page = queryset[:limit + 1]
+        state = page.aggregate(count=Count('pk'), modified=Max('date_modified'), ids=Sum('pk'))
+        etag = self.get_etag(state['count'], state['modified'], state['ids'])
+        response = get_conditional_response(request, etag=etag)
+
+        if response is None:
+            objs = self.get_objects(page, fields)
+            response = StreamingHttpResponse(self.stream(objs, fields, limit), content_type='application/json')
+
+        response['ETag'] = etag
+
+        return response
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.GET.get('limit', getattr(settings, 'VAULT_API_PAGE_SIZE', 100)))
+        except ValueError:
+            limit = 0
+
+        if limit < 1:
+            raise ApiError('Invalid limit.')
+
+        return limit
+
+    def stream(self, objs, fields, limit):
+        yield '{"results": ['
+        last = None
+
+        for i, obj in enumerate(objs):
+            if i == limit:
+                params = self.request.GET.copy()
+                params['cursor'] = last.pk
+
+                yield '], "next": ' + encoder.encode(self.request.build_absolute_uri(f'?{params.urlencode()}')) + '}'
+                return
+
+            yield (', ' if last else '') + encoder.encode(self.serialize(obj, fields))
+            last = obj
+
+        yield '], "next": null}'
+
+
+class DetailView(ApiView):
+    def get(self, request, pk):
+        fields = self.get_fields()
+        etag = self.get_object_etag(pk)
+        response = get_conditional_response(request, etag=etag)
+
+        if response is None:
+            # Only now, with the request known not to be answered by a 304, read and decrypt the selected fields.
+            response = JsonResponse(self.serialize(self.get_object(pk, fields), fields))
+
+        response['ETag'] = etag
+
+        return response
+
+    def get_object_etag(self, pk):
+        obj = get_object_or_404(self.get_queryset().only('pk', 'date_modified'), pk=pk)
+
+        return self.get_etag(obj.pk, obj.date_modified)
+
+    def get_object(self, pk, fields, decrypt=True):
+        obj = next(self.get_objects(self.get_queryset().filter(pk=pk), fields, decrypt), None)
+
+        if obj is None:
+            raise Http404
+
+        return obj
+
+
+class CredentialMixin:
+    model = Credential
+    fields = ['id', 'owner', 'team', 'name', 'username', 'password', 'url', 'date_created', 'date_modified']
+    default_fields = ['id', 'owner', 'team', 'name', 'username', 'url', 'date_created', 'date_modified']
+    secret_field = 'password'
+
+    def get_queryset(self):
+        return Credential.objects.visible_to(self.request.user)
+
+
+class SecureNoteMixin:
+    model = SecureNote
+    fields = ['id', 'owner', 'team', 'title', 'note', 'date_created', 'date_modified']
+    default_fields = ['id', 'owner', 'team', 'title', 'date_created', 'date_modified']
+    secret_field = 'note'
+
+    def get_queryset(self):
+        return SecureNote.objects.visible_to(self.request.user)
+
+
+class TeamMixin:
+    model = Team
+    fields = default_fields = ['id', 'owner', 'name', 'date_modified']
+
+    def get_queryset(self):
+        if self.request.user.is_superuser:
+            return Team.objects.all()
+
+        return Team.objects.filter(pk__in=get_team_membership(self.request).team_ids)
+
+
+class CredentialListView(CredentialMixin, ListView):
+    pass
+
+
+class CredentialDetailView(CredentialMixin, DetailView):
+    default_fields = CredentialMixin.fields
+
+
+class SecureNoteListView(SecureNoteMixin, ListView):
+    pass
+
+
+class SecureNoteDetailView(SecureNoteMixin, DetailView):
+    default_fields = SecureNoteMixin.fields
+
+
+class CredentialBatchView(CredentialMixin, ApiView):
+    """
+    Fetch many credentials at once, by ``?ids=1,2`` and/or ``?names=a,b``: one visibility query and one batch
+    decryption with a shared keyring, instead of a request per secret.
+
+    Ids and names matching nothing the user can see are listed under ``missing``.
+    """
+    default_fields = CredentialMixin.fields
+
+    def get(self, request):
+        fields = self.get_fields()
+        ids, names = self.get_selection()
+        objs = list(self.get_objects(self.get_batch_queryset(ids, names), self.get_batch_fields(fields)))
+
+        return self.batch_response(objs, fields, ids, names)
+
+    def get_selection(self):
+        names = self.get_list('names')
+
+        try:
+            ids = [int(pk) for pk in self.get_list('ids')]
+        except ValueError:
+            raise ApiError('Invalid ids.')
+
+        max_size = getattr(settings, 'VAULT_API_BATCH_SIZE', 100)
+
+        if not ids and not names:
+            raise ApiError('Select credentials with ids or names.')
+
+        if len(ids) + len(names) > max_size:
+            raise ApiError(f'At most {max_size} ids and names can be fetched at once.')
+
+        return ids, names
+
+    def get_batch_queryset(self, ids, names):
+        return self.get_queryset().filter(Q(pk__in=ids) | Q(name__in=names)).order_by('pk')
+
+    @staticmethod
+    def get_batch_fields(fields):
+        # Matching results to the requested ids and names needs both, whatever the caller selected.
+        return list({'id', 'name', *fields})
+
+    def batch_response(self, objs, fields, ids, names):
+        found_ids = {obj.pk for obj in objs}
+        found_names = {obj.name for obj in objs}
+
+        return JsonResponse({
+            'results': [self.serialize(obj, fields) for obj in objs],
+            'missing': {
+                'ids': [pk for pk in ids if pk not in found_ids],
+                'names': [name for name in names if name not in found_names],
+            },
+        })
+
+    def get_list(self, param):
+        return [value for value in self.request.GET.get(param, '').split(',') if value]
+
+
+class TeamListView(TeamMixin, ListView):
+    pass
+
+
+class TeamDetailView(TeamMixin, DetailView):
+    pass
@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class VaultConfig(AppConfig):
     name = 'vault'
+    default_auto_field = 'django.db.models.AutoField'
+
+    def ready(self):
+        from vault.metrics import register_collectors
+        from vault.search import install_all
+
+        post_migrate.connect(install_all, sender=self)
+        register_collectors()
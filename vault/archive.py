@@ -0,0 +1,174 @@
+import base64
+import datetime
+import getpass
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from django.apps import apps
+from django.contrib.auth.models import Permission
+from django.core.management.base import CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from vault.keyring import KEY_ITERATIONS
+from vault.metrics import pbkdf2_seconds
+
+MAGIC = b'PASSMAN-ARCHIVE-2'
+SALT_SIZE = 16
+FRAME_HEADER = struct.Struct('>I')
+
+# In dependency order, so an import can insert each batch as soon as it is read.
+MODELS = ['auth.Group', 'auth.Group_permissions', 'vault.User', 'vault.User_groups', 'vault.User_user_permissions',
+          'vault.Team', 'vault.Team_members', 'vault.Credential', 'vault.SecureNote']
+
+
+class ArchiveError(Exception):
+    pass
+
+
+class ArchiveEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder rounds to milliseconds; archives keep timestamps exact.
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+
+        return super(ArchiveEncoder, self).default(o)
+
+
+def archive_key(passphrase, salt):
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=KEY_ITERATIONS,
+                     backend=default_backend())
+    start = time.perf_counter()
+    key = kdf.derive(passphrase.encode())
+    pbkdf2_seconds.observe(time.perf_counter() - start, purpose='archive')
+
+    return Fernet(base64.urlsafe_b64encode(key))
+
+
+def get_model(label):
+    return apps.get_model(*label.split('.'))
+
+
+def archive_fields(model):
+    # search_text is derived from the other columns and rebuilt on import.
+    return [field for field in model._meta.concrete_fields if field.name != 'search_text']
+
+
+def permission_fields(model):
+    # Permission ids depend on the order migrations ran in, so permissions are archived by natural key instead.
+    return [field for field in archive_fields(model) if field.is_relation and field.related_model is Permission]
+
+
+def get_passphrase(env_var, confirm=False):
+    passphrase = os.environ.get(env_var)
+
+    if passphrase is None and sys.stdin.isatty():
+        passphrase = getpass.getpass('Archive passphrase: ')
+
+        if confirm and passphrase != getpass.getpass('Again: '):
+            raise CommandError('The passphrases differ.')
+
+    if not passphrase:
+        raise CommandError(f'Set the archive passphrase in ${env_var}.')
+
+    return passphrase
+
+
+class ArchiveWriter:
+    """
+    Write records to ``file`` as a sequence of independently compressed and encrypted chunks.
+
+    The archive starts with ``MAGIC`` and the salt of the passphrase key, followed by length-prefixed Fernet tokens,
+    one per chunk, and ends with an empty frame. Each chunk carries its sequence number, and a last one holds the
+    number of chunks before it, so frames that were dropped, reordered or cut off are detected even though each is
+    authenticated on its own. Secrets are stored as plaintext inside the chunks, which lets an import re-encrypt
+    them under whatever keys the target vault uses.
+    """
+
+    def __init__(self, file, passphrase):
+        salt = os.urandom(SALT_SIZE)
+        self.file = file
+        self.fernet = archive_key(passphrase, salt)
+        self.bytes_written = 0
+        self.chunks = 0
+        self._write(MAGIC + salt)
+
+    def _write(self, data):
+        self.file.write(data)
+        self.bytes_written += len(data)
+
+    def _write_frame(self, payload):
+        data = json.dumps(dict(payload, sequence=self.chunks), cls=ArchiveEncoder).encode()
+        token = self.fernet.encrypt(zlib.compress(data))
+        self._write(FRAME_HEADER.pack(len(token)) + token)
+
+    def write_chunk(self, records):
+        self._write_frame({'records': records})
+        self.chunks += 1
+
+    def close(self):
+        self._write_frame({'chunks': self.chunks})
+        self._write(FRAME_HEADER.pack(0))
+
+
+class ArchiveReader:
+    """
+    Read back the chunks written by ``ArchiveWriter``, one at a time.
+    """
+
+    def __init__(self, file, passphrase):
+        header = file.read(len(MAGIC) + SALT_SIZE)
+
+        if not header.startswith(MAGIC):
+            raise ArchiveError('Not a vault archive.')
+
+        self.file = file
+        self.fernet = archive_key(passphrase, header[len(MAGIC):])
+
+    def _read(self, size):
+        data = self.file.read(size)
+
+        if len(data) != size:
+            raise ArchiveError('The archive is truncated.')
+
+        return data
+
+    def _read_frame(self, sequence):
+        size, = FRAME_HEADER.unpack(self._read(FRAME_HEADER.size))
+
+        if not size:
+            raise ArchiveError('The archive is truncated.')
+
+        try:
+            data = self.fernet.decrypt(self._read(size))
+        except InvalidToken:
+            raise ArchiveError('Wrong passphrase, or the archive is corrupt.')
+
+        frame = json.loads(zlib.decompress(data))
+
+        if frame.get('sequence') != sequence:
+            raise ArchiveError('Chunks of the archive are missing or out of order.')
+
+        return frame
+
+    def __iter__(self):
+        sequence = 0
+
+        while True:
+            frame = self._read_frame(sequence)
+
+            if 'chunks' in frame:
+                break
+
+            yield frame['records']
+            sequence += 1
+
+        if frame['chunks'] != sequence or self._read(FRAME_HEADER.size) != FRAME_HEADER.pack(0):
+            raise ArchiveError('The archive is corrupt.')
@@ -0,0 +1,85 @@
+"""
+Async versions of the secret lookups in ``vault.api``, for ASGI deployments (``passman.asgi``).
+
+Database work runs through ``sync_to_async`` and decryption on the crypto executor, so a slow lookup holds neither
+the event loop nor a whole worker process.
+"""
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+
+from vault.api import (ApiError, CredentialBatchView, CredentialDetailView, authenticate_request, busy, forbidden,
+                       unauthorized)
+from vault.executor import CryptoExecutorBusy, crypto_executor, decrypt_many
+
+
+async def decrypt_secrets(objs, field):
+    """
+    Replace the ciphertext in ``field`` of each object with its plaintext, decrypting on the crypto executor.
+    """
+    # Waiting for room in the executor would block the event loop, so a full one fails the request straight away.
+    future = crypto_executor.submit(decrypt_many, [getattr(obj, field) for obj in objs], timeout=0)
+    plaintexts = await asyncio.wrap_future(future)
+
+    for obj, value in zip(objs, plaintexts):
+        setattr(obj, field, value.decode())
+
+
+def api_view(view_class):
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(request, *args, **kwargs):
+            view = view_class(request=request, args=args, kwargs=kwargs)
+            user = await sync_to_async(authenticate_request)(request)
+
+            if user is None:
+                return unauthorized()
+
+            if not await sync_to_async(view.has_permission)(user):
+                return forbidden()
+
+            try:
+                return await func(view, *args, **kwargs)
+            except ApiError as e:
+                return JsonResponse({'detail': e.detail}, status=e.status)
+            except CryptoExecutorBusy:
+                return busy()
+
+        return wrapper
+
+    return decorator
+
+
+@api_view(CredentialDetailView)
+async def credential_detail(view, pk):
+    fields = view.get_fields()
+    etag = await sync_to_async(view.get_object_etag)(pk)
+    response = get_conditional_response(view.request, etag=etag)
+
+    if response is None:
+        obj = await sync_to_async(view.get_object)(pk, fields, decrypt=False)
+
+        if view.secret_field in fields:
+            await decrypt_secrets([obj], view.secret_field)
+
+        response = JsonResponse(view.serialize(obj, fields))
+
+    response['ETag'] = etag
+
+    return response
+
+
+@api_view(CredentialBatchView)
+async def credential_batch(view):
+    fields = view.get_fields()
+    ids, names = view.get_selection()
+    queryset = view.get_batch_queryset(ids, names)
+    objs = await sync_to_async(list)(view.get_objects(queryset, view.get_batch_fields(fields), decrypt=False))
+
+    if view.secret_field in fields:
+        await decrypt_secrets(objs, view.secret_field)
+
+    return view.batch_response(objs, fields, ids, names)
@@ -0,0 +1,177 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class MembershipCache:
+    """
+    Cross-request cache of each user's teams, as a ``{team id: owner id}`` dict, on top of Django's cache framework.
+
+    ``VAULT_MEMBERSHIP_CACHE`` names the ``CACHES`` alias to use. The default local memory cache is per process, so
+    deployments running several workers should point it at memcached or Redis to make invalidation reach all of them.
+    Entries are dropped by the Team and Team.members receivers in ``vault.models``.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'VAULT_MEMBERSHIP_CACHE', 'default')]
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'VAULT_MEMBERSHIP_CACHE_TIMEOUT', 300)
+
+    @staticmethod
+    def key(user_id):
+        return f'vault:membership:{user_id}'
+
+    def get_or_load(self, user_id, load):
+        teams = self.cache.get(self.key(user_id))
+
+        with self._lock:
+            if teams is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if teams is None:
+            teams = load()
+            self.cache.set(self.key(user_id), teams, self.timeout)
+
+        return teams
+
+    def invalidate(self, user_ids):
+        self.cache.delete_many([self.key(user_id) for user_id in user_ids if user_id is not None])
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+
+membership_cache = MembershipCache()
+
+
+class SecretCache:
+    """
+    Opt-in, per-process LRU cache of decrypted secrets, so secrets viewed over and over skip Fernet.
+
+    Entries are keyed by model and primary key and carry a digest of the ciphertext they were decrypted from, so a
+    row re-encrypted behind the signals' back (``bulk_update``, ``vault_rekey``) is never served stale. Plaintexts
+    live in ``bytearray`` buffers that are overwritten with zeros as soon as they expire, are evicted to stay within
+    ``VAULT_SECRET_CACHE_MAX_BYTES`` or are invalidated by the save and delete receivers in ``vault.models``. Copies
+    handed out to callers are ordinary ``bytes`` and are not wiped.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._entries = OrderedDict()
+        self._next_purge = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'VAULT_SECRET_CACHE', False)
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'VAULT_SECRET_CACHE_TIMEOUT', 30)
+
+    @property
+    def max_bytes(self):
+        return getattr(settings, 'VAULT_SECRET_CACHE_MAX_BYTES', 1024 * 1024)
+
+    @staticmethod
+    def key(model, pk):
+        return model._meta.label_lower, pk
+
+    def get_or_decrypt(self, model, pk, ciphertext, decrypt):
+        if not self.enabled or pk is None:
+            return decrypt(ciphertext)
+
+        key = self.key(model, pk)
+        digest = hashlib.sha256(ciphertext.encode()).digest()
+        now = time.monotonic()
+
+        with self._lock:
+            self._purge_expired(now)
+            entry = self._entries.get(key)
+
+            if entry and entry[0] == digest and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+
+                return bytes(entry[2])
+
+            self.misses += 1
+
+        value = decrypt(ciphertext)
+
+        with self._lock:
+            self._evict(key)
+
+            if len(value) <= self.max_bytes:
+                self._entries[key] = digest, now + self.timeout, bytearray(value)
+                self.size += len(value)
+
+                while self.size > self.max_bytes:
+                    self._evict(next(iter(self._entries)))
+
+        return value
+
+    def invalidate(self, model, pk):
+        with self._lock:
+            self._evict(self.key(model, pk))
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._evict(key)
+
+    def _evict(self, key):
+        entry = self._entries.pop(key, None)
+
+        if entry:
+            buffer = entry[2]
+            buffer[:] = bytes(len(buffer))
+            self.size -= len(buffer)
+
+    def _purge_expired(self, now):
+        # A full scan, but at most once per timeout, so expired plaintexts don't wait for a lookup of their own key.
+        if now < self._next_purge:
+            return
+
+        for key in [key for key, entry in self._entries.items() if entry[1] <= now]:
+            self._evict(key)
+
+        self._next_purge = now + self.timeout
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self.size,
+            }
+
+
+secret_cache = SecretCache()
@@ -0,0 +1,181 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.apps import apps
+from django.conf import settings
+
+from vault.keyring import get_keyring
+
+_worker = threading.local()
+
+
+class CryptoExecutorBusy(RuntimeError):
+    pass
+
+
+def init_worker():
+    _worker.active = True
+
+    if not apps.ready:
+        django.setup()
+
+
+def run_in_worker(func, values):
+    # Set up on every call rather than with the pool's initializer, which Python 3.6 lacks.
+    init_worker()
+
+    return func(values)
+
+
+def encrypt_many(values):
+    keyring = get_keyring()
+
+    return [keyring.encrypt(value.encode()) for value in values]
+
+
+def decrypt_many(values):
+    keyring = get_keyring()
+
+    return [keyring.decrypt(value) for value in values]
+
+
+class CryptoExecutor:
+    """
+    Pool that encryption and decryption are handed to, so crypto bursts queue up there instead of on request threads.
+
+    ``VAULT_CRYPTO_EXECUTOR`` picks a ``'thread'`` pool (the default), a ``'process'`` pool, which keeps the work off
+    the request process's GIL at the cost of pickling every batch, or ``'inline'`` to run on the calling thread.
+    ``run()`` keeps batches of up to ``VAULT_CRYPTO_INLINE_MAX`` values on the calling thread as well, as handing a
+    single value to the pool costs more than encrypting it. At most ``VAULT_CRYPTO_MAX_PENDING`` batches may be
+    queued or running; callers wait up to ``VAULT_CRYPTO_TIMEOUT`` seconds for room and then get ``CryptoExecutorBusy``.
+    """
+
+    def __init__(self):
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self._pool = None
+        self._slots = None
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    @property
+    def mode(self):
+        return getattr(settings, 'VAULT_CRYPTO_EXECUTOR', 'thread')
+
+    @property
+    def workers(self):
+        return getattr(settings, 'VAULT_CRYPTO_WORKERS', 4)
+
+    @property
+    def max_pending(self):
+        return getattr(settings, 'VAULT_CRYPTO_MAX_PENDING', 64)
+
+    @property
+    def inline_max(self):
+        return getattr(settings, 'VAULT_CRYPTO_INLINE_MAX', 8)
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'VAULT_CRYPTO_TIMEOUT', 5)
+
+    @property
+    def pending(self):
+        return self.submitted - self.completed
+
+    def check_fork(self):
+        """
+        Start over in a forked child (vault_rekey workers, gunicorn's preload), which inherits the pool but none of
+        its threads, and maybe a lock held by one of them.
+        """
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pool = None
+            self._lock = threading.Lock()
+            self.submitted = self.completed = 0
+
+    def get_pool(self):
+        self.check_fork()
+
+        with self._lock:
+            if self._pool is None:
+                pool_class = ProcessPoolExecutor if self.mode == 'process' else ThreadPoolExecutor
+                self._pool = pool_class(max_workers=self.workers)
+                self._slots = threading.BoundedSemaphore(self.max_pending)
+
+            return self._pool
+
+    def submit(self, func, values, timeout=None):
+        """
+        Schedule ``func(values)`` and return its ``Future``, waiting at most ``timeout`` seconds (by default
+        ``VAULT_CRYPTO_TIMEOUT``) for the pool to have room.
+        """
+        # Work submitted from a pool thread runs right there, rather than waiting on the pool it is holding up.
+        if self.mode == 'inline' or getattr(_worker, 'active', False):
+            future = Future()
+            future.set_result(func(values))
+
+            return future
+
+        pool = self.get_pool()
+        timeout = self.timeout if timeout is None else timeout
+
+        if not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self.rejected += 1
+
+            raise CryptoExecutorBusy(f'More than {self.max_pending} crypto batches waited {timeout}s.')
+
+        start = time.perf_counter()
+
+        with self._lock:
+            self.submitted += 1
+
+        future = pool.submit(run_in_worker, func, values)
+        future.add_done_callback(lambda f: self._done(start))
+
+        return future
+
+    def _done(self, start):
+        latency = time.perf_counter() - start
+        self._slots.release()
+
+        with self._lock:
+            self.completed += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def run(self, func, values):
+        if len(values) <= self.inline_max:
+            return func(values)
+
+        return self.submit(func, values).result()
+
+    def shutdown(self):
+        self.check_fork()
+
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def stats(self):
+        self.check_fork()
+
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'pending': self.pending,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'latency_avg': self.latency_total / self.completed if self.completed else 0.0,
+                'latency_max': self.latency_max,
+            }
+
+
+crypto_executor = CryptoExecutor()
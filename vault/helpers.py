@@ -1,34 +1,30 @@
-import base64
-import os
+from vault.executor import crypto_executor, decrypt_many, encrypt_many
+from vault.instrumentation import timed_crypto
 
-from cryptography.fernet import Fernet
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from django.conf import settings
 
+def encrypt_value(value):
+    with timed_crypto('encrypt', 1):
+        return crypto_executor.run(encrypt_many, [value])[0]
 
-def generate_key():
-    password = settings.SECRET_KEY.encode()
-    salt = f'{os.urandom(16)}'.encode()
-    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=100000, backend=default_backend())
-    key = base64.urlsafe_b64encode(kdf.derive(password))
 
-    return key
+def decrypt_value(value):
+    with timed_crypto('decrypt', 1):
+        return crypto_executor.run(decrypt_many, [value])[0]
 
 
-def encrypt_value(value):
-    key = generate_key()
-    f = Fernet(key)
-    value_hash = f.encrypt(value.encode())
-    encrypted_value = f'{key.decode()}^{value_hash.decode()}'
+def encrypt_values(values):
+    values = list(values)
 
-    return encrypted_value
+    with timed_crypto('encrypt', len(values)):
+        results = crypto_executor.run(encrypt_many, values)
 
+    yield from results
 
-def decrypt_value(value):
-    key, value_hash = value.split('^')
-    f = Fernet(key.encode())
-    decrypted_value = f.decrypt(value_hash.encode())
 
-    return decrypted_value
+def decrypt_values(values):
+    values = list(values)
+
+    with timed_crypto('decrypt', len(values)):
+        results = crypto_executor.run(decrypt_many, values)
+
+    yield from results
@@ -0,0 +1,181 @@
+"""
+Parsers for the password manager exchange formats, and a batched importer for the credentials they yield.
+
+Every parser takes a binary file and yields ``Entry`` tuples one at a time. CSV and KeePass XML are read
+incrementally; the JSON formats are loaded whole, as the standard library has no streaming JSON parser.
+"""
+import csv
+import io
+import json
+import os
+import xml.etree.ElementTree as ElementTree
+import zipfile
+from collections import namedtuple
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from vault.models import BATCH_SIZE, Credential
+
+Entry = namedtuple('Entry', ['name', 'username', 'password', 'url'])
+
+CSV_COLUMNS = {
+    'name': ['name', 'title', 'account'],
+    'username': ['username', 'login_username', 'login', 'user name', 'user'],
+    'password': ['password', 'login_password'],
+    'url': ['url', 'login_uri', 'website', 'web site'],
+}
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def parse_csv(file):
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+
+    try:
+        columns = {name.strip().lower(): name for name in reader.fieldnames or []}
+        mapping = {}
+
+        for field, aliases in CSV_COLUMNS.items():
+            mapping[field] = next((columns[alias] for alias in aliases if alias in columns), None)
+
+        if not mapping['name'] or not mapping['password']:
+            raise ImportFormatError('CSV files need at least a name (or title) and a password column.')
+
+        for row in reader:
+            yield Entry(**{field: (row.get(column) or '').strip() if column else ''
+                           for field, column in mapping.items()})
+    except UnicodeDecodeError:
+        raise ImportFormatError('CSV files must be encoded as UTF-8.')
+    except csv.Error as e:
+        raise ImportFormatError(f'Invalid CSV: {e}')
+
+
+def parse_keepass(file):
+    """
+    Entries of a KeePass 2 XML export. Past versions of entries, kept under ``History``, are skipped.
+    """
+    history = 0
+
+    try:
+        for event, element in ElementTree.iterparse(file, events=['start', 'end']):
+            if element.tag == 'History':
+                history += 1 if event == 'start' else -1
+            elif element.tag == 'Entry' and event == 'end':
+                if not history:
+                    strings = {string.findtext('Key'): string.findtext('Value') or ''
+                               for string in element.iter('String')}
+                    yield Entry(strings.get('Title', ''), strings.get('UserName', ''), strings.get('Password', ''),
+                                strings.get('URL', ''))
+
+                element.clear()
+    except ElementTree.ParseError as e:
+        raise ImportFormatError(f'Invalid KeePass XML: {e}')
+
+
+def load_json(file):
+    try:
+        return json.load(file)
+    except ValueError as e:
+        raise ImportFormatError(f'Invalid JSON: {e}')
+
+
+def parse_bitwarden(file):
+    export = load_json(file)
+
+    try:
+        for item in export.get('items', []):
+            login = item.get('login')
+
+            # Bitwarden type 1 is a login; cards, identities and notes have no credentials.
+            if item.get('type') != 1 or not login:
+                continue
+
+            uris = login.get('uris') or [{}]
+            yield Entry(item.get('name') or '', login.get('username') or '', login.get('password') or '',
+                        uris[0].get('uri') or '')
+    except (AttributeError, IndexError, TypeError):
+        raise ImportFormatError('Not a Bitwarden JSON export.')
+
+
+def parse_1password(file):
+    """
+    Login items of a 1PUX export, or of the ``export.data`` file inside one.
+    """
+    if zipfile.is_zipfile(file):
+        try:
+            with zipfile.ZipFile(file) as archive, archive.open('export.data') as data:
+                export = load_json(data)
+        except KeyError:
+            raise ImportFormatError('1PUX files must contain an export.data file.')
+    else:
+        file.seek(0)
+        export = load_json(file)
+
+    try:
+        for account in export.get('accounts', []):
+            for vault in account.get('vaults', []):
+                for item in vault.get('items', []):
+                    overview = item.get('overview', {})
+                    fields = {field.get('designation'): field.get('value') or ''
+                              for field in item.get('details', {}).get('loginFields', [])}
+
+                    if 'password' in fields:
+                        yield Entry(overview.get('title') or '', fields.get('username', ''), fields['password'],
+                                    overview.get('url') or '')
+    except (AttributeError, TypeError):
+        raise ImportFormatError('Not a 1Password export.')
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'keepass': parse_keepass,
+    'bitwarden': parse_bitwarden,
+    '1password': parse_1password,
+}
+
+
+def detect_format(filename):
+    extension = os.path.splitext(filename)[1].lower()
+
+    if extension == '.csv':
+        return 'csv'
+
+    if extension == '.xml':
+        return 'keepass'
+
+    if extension in ['.data', '.1pux']:
+        return '1password'
+
+    if extension == '.json':
+        return 'bitwarden'
+
+    raise ImportFormatError(f'Cannot tell the format of {filename!r}; pick one of {", ".join(PARSERS)}.')
+
+
+def import_credentials(entries, owner, team=None, batch_size=BATCH_SIZE):
+    """
+    Validate ``entries`` with the ``Credential`` field validators and create the valid ones for ``owner``, encrypted
+    and inserted ``batch_size`` at a time. Returns the number created and ``(entry number, messages)`` for each
+    entry that was skipped.
+    """
+    errors = []
+
+    def validated():
+        for number, entry in enumerate(entries, 1):
+            credential = Credential(owner=owner, team=team, **entry._asdict())
+
+            try:
+                credential.clean_fields(exclude=['owner', 'team'])
+            except ValidationError as e:
+                errors.append((number, [f'{field}: {" ".join(messages)}'
+                                        for field, messages in e.message_dict.items()]))
+            else:
+                yield credential
+
+    with transaction.atomic():
+        created = Credential.objects.bulk_create_encrypted(validated(), batch_size)
+
+    return len(created), errors
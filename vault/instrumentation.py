@@ -0,0 +1,75 @@
+"""
+Per request counters of the database and crypto work done while handling a request, collected for the requests
+``InstrumentationMiddleware`` measures.
+"""
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+from vault.metrics import crypto_seconds, crypto_values
+
+_local = threading.local()
+
+
+class RequestMetrics:
+    """
+    Query count, database time and crypto time of one request. Registered with ``connection.execute_wrapper``, so
+    every query run on any database connection of the request thread passes through ``__call__``.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.crypto_ops = 0
+        self.crypto_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+
+def get_metrics():
+    return getattr(_local, 'metrics', None)
+
+
+@contextmanager
+def collect_metrics():
+    metrics = RequestMetrics()
+    _local.metrics = metrics
+
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+
+            yield metrics
+    finally:
+        _local.metrics = None
+
+
+@contextmanager
+def timed_crypto(operation, count):
+    """
+    Record the time spent in the block in the crypto metrics, and in the crypto time of the request being measured,
+    if any.
+    """
+    metrics = get_metrics()
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        crypto_seconds.observe(elapsed, operation=operation)
+        crypto_values.inc(count, operation=operation)
+
+        if metrics is not None:
+            metrics.crypto_ops += count
+            metrics.crypto_time += elapsed
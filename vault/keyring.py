@@ -0,0 +1,126 @@
+import base64
+import threading
+import time
+from functools import lru_cache
+
+from cryptography.fernet import Fernet
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from vault.metrics import pbkdf2_seconds
+
+FORMAT_VERSION = 'v1'
+SEPARATOR = '$'
+LEGACY_SEPARATOR = '^'
+KEY_ITERATIONS = 100000
+KEY_CACHE_SIZE = 16
+
+_keyring_lock = threading.Lock()
+
+
+class UnknownKeyError(KeyError):
+    pass
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def derive_key(secret, key_id):
+    """
+    Derive a Fernet key from the given secret for one key id.
+
+    The result only depends on its arguments, so it is computed once per process and then served from the cache.
+    Fernet itself picks a fresh random IV for every token, so reusing the key never reuses a nonce.
+    """
+    salt = f'passman-vault-{key_id}'.encode()
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=KEY_ITERATIONS,
+                     backend=default_backend())
+    start = time.perf_counter()
+    key = kdf.derive(secret.encode())
+    pbkdf2_seconds.observe(time.perf_counter() - start, purpose='keyring')
+
+    return base64.urlsafe_b64encode(key)
+
+
+class Keyring:
+    """
+    The set of Fernet keys the vault can read, indexed by key id, and the primary one new values are written with.
+
+    Stored values look like ``v1$<key id>$<fernet token>``, so decrypting is a dictionary lookup followed by a single
+    Fernet operation. Rotating keys without downtime means adding a new key id, making it primary and re-encrypting
+    rows at leisure: values written under the old key id stay readable for as long as it is kept in the keyring.
+    """
+
+    def __init__(self, secrets, primary_key_id):
+        for key_id in secrets:
+            # A value holding the legacy separator would be read as a legacy one, and never decrypt.
+            for separator in [SEPARATOR, LEGACY_SEPARATOR]:
+                if separator in key_id:
+                    raise ImproperlyConfigured(f'Vault key id {key_id!r} must not contain {separator!r}.')
+
+        if primary_key_id not in secrets:
+            raise ImproperlyConfigured(f'Primary vault key id {primary_key_id!r} is not in VAULT_KEYS.')
+
+        self.primary_key_id = primary_key_id
+        self.fernets = {key_id: Fernet(derive_key(secret, key_id)) for key_id, secret in secrets.items()}
+
+    def get_fernet(self, key_id):
+        try:
+            return self.fernets[key_id]
+        except KeyError:
+            raise UnknownKeyError(f'Vault key id {key_id!r} is not in VAULT_KEYS.')
+
+    def encrypt(self, value):
+        token = self.fernets[self.primary_key_id].encrypt(value)
+
+        return f'{FORMAT_VERSION}{SEPARATOR}{self.primary_key_id}{SEPARATOR}{token.decode()}'
+
+    def decrypt(self, value):
+        if LEGACY_SEPARATOR in value:
+            key, token = value.split(LEGACY_SEPARATOR)
+            return Fernet(key.encode()).decrypt(token.encode())
+
+        version, key_id, token = value.split(SEPARATOR)
+
+        if version != FORMAT_VERSION:
+            raise ValueError(f'Unsupported vault value format {version!r}.')
+
+        return self.get_fernet(key_id).decrypt(token.encode())
+
+    def key_id(self, value):
+        """
+        Return the key id a stored value was written with, or ``None`` for values in the legacy inline-key format.
+        """
+        if LEGACY_SEPARATOR in value:
+            return None
+
+        return value.split(SEPARATOR, 2)[1]
+
+    def needs_rotation(self, value):
+        return self.key_id(value) != self.primary_key_id
+
+    def rotate(self, value):
+        if not self.needs_rotation(value):
+            return value
+
+        return self.encrypt(self.decrypt(value))
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def _build_keyring(secrets, primary_key_id):
+    return Keyring(dict(secrets), primary_key_id)
+
+
+def clear_keyring_cache():
+    derive_key.cache_clear()
+    _build_keyring.cache_clear()
+
+
+def get_keyring():
+    secrets = getattr(settings, 'VAULT_KEYS', None) or {'1': settings.SECRET_KEY}
+    primary_key_id = getattr(settings, 'VAULT_PRIMARY_KEY_ID', None) or next(iter(secrets))
+
+    # The lock makes concurrent first calls wait for a single derivation instead of racing to run PBKDF2 each.
+    with _keyring_lock:
+        return _build_keyring(tuple(sorted(secrets.items())), primary_key_id)
@@ -0,0 +1,52 @@
+import importlib
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+import benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Run the benchmarks in benchmarks/ against the configured database, inside a transaction that is '
+            'rolled back, and optionally compare them with a saved baseline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--suite', action='append', choices=benchmarks.SUITES,
+                            help='Benchmark suite to run; repeat for several. All of them by default.')
+        parser.add_argument('--operations', type=int, default=1000, help='Values encrypted and decrypted.')
+        parser.add_argument('--writes', type=int, default=50, help='Number of credential saves per run.')
+        parser.add_argument('--sizes', default='1000', help='Comma separated credential counts to time the '
+                                                            'changelist at, e.g. 1000,100000,1000000.')
+        parser.add_argument('--repeat', type=int, default=5, help='Changelist requests timed per size and user.')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--baseline', help='JSON file of an earlier run to compare with.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Fail when a result is worse than the baseline by more than this fraction.')
+
+    def handle(self, *args, **options):
+        options['sizes'] = sorted(int(size) for size in options['sizes'].split(','))
+        results = []
+
+        with transaction.atomic():
+            for suite in options['suite'] or benchmarks.SUITES:
+                for result in importlib.import_module(f'benchmarks.{suite}').run(options):
+                    results.append(result)
+                    self.stdout.write(f'{result.name:45} {result.value:12.2f} {result.unit}')
+
+            transaction.set_rollback(True)
+
+        if options['output']:
+            benchmarks.save(results, options['output'])
+
+        if options['baseline']:
+            regressions = list(benchmarks.regressions(results, benchmarks.load(options['baseline']),
+                                                      options['threshold']))
+
+            for result, before, change in regressions:
+                self.stderr.write(f'{result.name}: {before.value:.2f} -> {result.value:.2f} {result.unit} '
+                                  f'({change:+.0%})')
+
+            if regressions:
+                raise CommandError(f'{len(regressions)} results regressed by more than {options["threshold"]:.0%}.')
+
+            self.stdout.write(self.style.SUCCESS('No regressions.'))
@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from vault.archive import MODELS, ArchiveWriter, archive_fields, get_model, get_passphrase, permission_fields
+
+
+class Command(BaseCommand):
+    help = ('Write every user, group, team, credential and secure note, and the permissions of users and groups, to a '
+            'compressed archive encrypted with a passphrase, for backups or moving the vault to another database. '
+            'Restore it with vault_import.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archive file to write.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows read, compressed and encrypted '
+                                                                         'at a time.')
+        parser.add_argument('--passphrase-env', default='VAULT_ARCHIVE_PASSPHRASE',
+                            help='Environment variable holding the passphrase; prompted for when unset.')
+
+    def handle(self, *args, **options):
+        passphrase = get_passphrase(options['passphrase_env'], confirm=True)
+        chunk_size = options['chunk_size']
+        start = time.perf_counter()
+        rows = 0
+
+        # One transaction, so every model is read from the same snapshot and rows reference only exported rows.
+        with open(options['path'], 'wb') as f, transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+
+            writer = ArchiveWriter(f, passphrase)
+            chunk = []
+
+            for record in self.records(chunk_size):
+                chunk.append(record)
+
+                if len(chunk) == chunk_size:
+                    writer.write_chunk(chunk)
+                    rows += len(chunk)
+                    chunk = []
+                    self.stdout.write(f'{rows} rows, {rows / (time.perf_counter() - start):.0f} rows/sec')
+
+            writer.write_chunk(chunk)
+            writer.close()
+
+        rows += len(chunk)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {rows} rows ({writer.bytes_written / 1024:.0f} KiB) in {elapsed:.1f}s, '
+            f'{rows / elapsed:.0f} rows/sec.'))
+
+    def records(self, chunk_size):
+        for label in MODELS:
+            model = get_model(label)
+            fields = archive_fields(model)
+            natural_key_fields = permission_fields(model)
+            queryset = model._default_manager.order_by('pk').select_related(
+                *[f'{field.name}__content_type' for field in natural_key_fields])
+
+            if hasattr(queryset, 'decrypt_iter'):
+                objs = queryset.decrypt_iter(chunk_size)
+            else:
+                objs = queryset.iterator(chunk_size=chunk_size)
+
+            for obj in objs:
+                record = {field.attname: getattr(obj, field.attname) for field in fields}
+
+                for field in natural_key_fields:
+                    record[field.attname] = getattr(obj, field.name).natural_key()
+
+                yield label, record
@@ -0,0 +1,86 @@
+import time
+from itertools import groupby
+
+from django.contrib.auth.models import Permission
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from vault.archive import (MODELS, ArchiveError, ArchiveReader, archive_fields, get_model, get_passphrase,
+                           permission_fields)
+
+
+class Command(BaseCommand):
+    help = ('Load an archive written by vault_export into an empty vault. Secrets are encrypted under this '
+            'installation\'s VAULT_PRIMARY_KEY_ID.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archive file to read.')
+        parser.add_argument('--passphrase-env', default='VAULT_ARCHIVE_PASSPHRASE',
+                            help='Environment variable holding the passphrase; prompted for when unset.')
+
+    def handle(self, *args, **options):
+        models = [get_model(label) for label in MODELS]
+
+        if any(model._base_manager.exists() for model in models):
+            raise CommandError('The vault is not empty; import into a freshly migrated database.')
+
+        passphrase = get_passphrase(options['passphrase_env'])
+        start = time.perf_counter()
+        rows = 0
+
+        try:
+            with open(options['path'], 'rb') as f, transaction.atomic():
+                for chunk in ArchiveReader(f, passphrase):
+                    for label, records in groupby(chunk, key=lambda record: record[0]):
+                        rows += self.create(get_model(label), [fields for _, fields in records])
+
+                    self.stdout.write(f'{rows} rows, {rows / (time.perf_counter() - start):.0f} rows/sec')
+
+                # Rows kept their primary keys, so sequences must move past them (PostgreSQL).
+                with connection.cursor() as cursor:
+                    for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                        cursor.execute(sql)
+        except ArchiveError as e:
+            raise CommandError(e)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'Imported {rows} rows in {elapsed:.1f}s, {rows / elapsed:.0f} rows/sec.'))
+
+    def get_permission_id(self, natural_key):
+        if not hasattr(self, 'permission_ids'):
+            self.permission_ids = {permission.natural_key(): permission.pk
+                                   for permission in Permission.objects.select_related('content_type')}
+
+        try:
+            return self.permission_ids[tuple(natural_key)]
+        except KeyError:
+            raise ArchiveError(f'The permission {".".join(natural_key[1:])}.{natural_key[0]} does not exist here.')
+
+    def create(self, model, records):
+        fields = archive_fields(model)
+
+        for record in records:
+            for field in permission_fields(model):
+                record[field.attname] = self.get_permission_id(record[field.attname])
+
+        objs = [model(**{field.attname: field.to_python(record[field.attname]) for field in fields})
+                for record in records]
+        # bulk_create stamps auto_now and auto_now_add fields with the current time; the exported ones are put back.
+        stamped = [field for field in fields
+                   if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+        dates = [[getattr(obj, field.attname) for field in stamped] for obj in objs]
+
+        if hasattr(model.objects, 'bulk_create_encrypted'):
+            model.objects.bulk_create_encrypted(objs)
+        else:
+            model._base_manager.bulk_create(objs)
+
+        if stamped:
+            for obj, values in zip(objs, dates):
+                for field, value in zip(stamped, values):
+                    setattr(obj, field.attname, value)
+
+            model._base_manager.bulk_update(objs, [field.name for field in stamped])
+
+        return len(objs)
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vault.importers import PARSERS, ImportFormatError, detect_format, import_credentials
+from vault.models import User, Team
+
+
+class Command(BaseCommand):
+    help = 'Import credentials from a CSV, KeePass 2 XML, Bitwarden JSON or 1Password (1PUX) export.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Export file to read.')
+        parser.add_argument('--owner', required=True, help='Email of the user who will own the credentials.')
+        parser.add_argument('--team', help='Name of the team to share the credentials with.')
+        parser.add_argument('--format', choices=sorted(PARSERS), help='Format of the file; guessed from its '
+                                                                       'extension by default.')
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(email=options['owner'])
+            team = Team.objects.get(name=options['team']) if options['team'] else None
+        except (User.DoesNotExist, Team.DoesNotExist) as e:
+            raise CommandError(e)
+
+        start = time.perf_counter()
+
+        try:
+            parse = PARSERS[options['format'] or detect_format(options['path'])]
+
+            with open(options['path'], 'rb') as f:
+                created, errors = import_credentials(parse(f), owner, team)
+        except ImportFormatError as e:
+            raise CommandError(e)
+
+        for number, messages in errors:
+            self.stderr.write(f'Skipped entry {number}: {"; ".join(messages)}')
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'Imported {created} credentials in {elapsed:.1f}s, '
+                                             f'{len(errors)} skipped.'))
@@ -0,0 +1,70 @@
+import base64
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Fire concurrent API requests at one or more running deployments and compare their throughput, e.g. '
+            '--target wsgi=http://127.0.0.1:8000/api/credentials/1/ '
+            '--target asgi=http://127.0.0.1:8001/api/async/credentials/1/')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', required=True, metavar='LABEL=URL',
+                            help='Deployment to load, as label=url. Repeat to compare several.')
+        parser.add_argument('--user', required=True, metavar='EMAIL:PASSWORD', help='Basic auth credentials.')
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per target.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once.')
+
+    def handle(self, *args, **options):
+        self.authorization = f'Basic {base64.b64encode(options["user"].encode()).decode()}'
+        results = []
+
+        for target in options['target']:
+            label, _, url = target.partition('=')
+
+            if not url:
+                raise CommandError(f'Targets look like label=url, not {target!r}.')
+
+            results.append((label, self.run(url, options['requests'], options['concurrency'])))
+
+        for label, (throughput, latencies, errors) in results:
+            if not latencies:
+                self.stdout.write(self.style.ERROR(f'{label:>10}: all {errors} requests failed'))
+                continue
+
+            latencies = sorted(latencies)
+            p50, p95 = (latencies[int(p * (len(latencies) - 1))] * 1000 for p in (0.5, 0.95))
+            self.stdout.write(f'{label:>10}: {throughput:8.1f} req/sec, p50 {p50:7.1f} ms, p95 {p95:7.1f} ms, '
+                              f'{errors} errors')
+
+        baseline = results[0][1][0]
+
+        if len(results) > 1 and baseline:
+            for label, (throughput, latencies, errors) in results[1:]:
+                self.stdout.write(self.style.SUCCESS(f'{label} vs {results[0][0]}: {throughput / baseline:.2f}x'))
+
+    def run(self, url, requests, concurrency):
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            start = time.perf_counter()
+            outcomes = list(executor.map(self.fetch, [url] * requests))
+            elapsed = time.perf_counter() - start
+
+        latencies = [latency for ok, latency in outcomes if ok]
+
+        return len(latencies) / elapsed, latencies, requests - len(latencies)
+
+    def fetch(self, url):
+        request = urllib.request.Request(url, headers={'Authorization': self.authorization})
+        start = time.perf_counter()
+
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+        except (urllib.error.URLError, OSError):
+            return False, time.perf_counter() - start
+
+        return True, time.perf_counter() - start
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from vault.models import Credential, SecureNote, VaultAccess
+
+
+class Command(BaseCommand):
+    help = 'Recompute the VaultAccess table from credential and secure note owners, teams and team members.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows recomputed per transaction.')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        for model in [Credential, SecureNote]:
+            bounds = model.objects.aggregate(low=Min('pk'), high=Max('pk'))
+
+            if bounds['low'] is None:
+                continue
+
+            for start in range(bounds['low'], bounds['high'] + 1, chunk_size):
+                with transaction.atomic():
+                    model.objects.filter(pk__gte=start, pk__lt=start + chunk_size).refresh_access()
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {VaultAccess.objects.count()} access rows.'))
@@ -0,0 +1,146 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
+from django.db.models import Max, Min
+
+from vault.keyring import FORMAT_VERSION, SEPARATOR, get_keyring
+
+MODELS = ['vault.Credential', 'vault.SecureNote']
+
+
+# Pid of the worker process init_worker last set up, if any.
+_worker_pid = None
+
+
+def init_worker():
+    global _worker_pid
+
+    if _worker_pid == os.getpid():
+        return
+
+    _worker_pid = os.getpid()
+
+    if not apps.ready:
+        django.setup()
+
+    # Forked workers inherit the parent's connections; they must open their own.
+    connections.close_all()
+
+
+def rekey_range_in_worker(*args):
+    # Set up on the first range each worker gets rather than with the pool's initializer, which Python 3.6 lacks.
+    init_worker()
+
+    return rekey_range(*args)
+
+
+def rekey_range(label, start, end, batch_size):
+    """
+    Re-encrypt the rows of one model with ``start <= pk < end`` under the primary key, a batch per transaction.
+
+    Returns the range together with the number of rows rewritten.
+    """
+    model = apps.get_model(label)
+    field = model.secret_field
+    keyring = get_keyring()
+    prefix = f'{FORMAT_VERSION}{SEPARATOR}{keyring.primary_key_id}{SEPARATOR}'
+    rows = model._base_manager.filter(pk__gte=start, pk__lt=end).exclude(**{f'{field}__startswith': prefix})
+    rotated = 0
+
+    while True:
+        with transaction.atomic():
+            batch = list(rows.select_for_update().only('pk', field).order_by('pk')[:batch_size])
+
+            for obj in batch:
+                setattr(obj, field, keyring.rotate(getattr(obj, field)))
+
+            model._base_manager.bulk_update(batch, [field])
+
+        rotated += len(batch)
+
+        if len(batch) < batch_size:
+            return label, start, end, rotated
+
+
+class Command(BaseCommand):
+    help = ('Re-encrypt every credential and secure note under VAULT_PRIMARY_KEY_ID. Run it after adding a new key '
+            'to VAULT_KEYS and making it primary; the old key can be dropped once it finishes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Number of worker processes; 1 re-encrypts in this process.')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Width of the primary key ranges.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows rewritten per transaction.')
+        parser.add_argument('--checkpoint', default='vault_rekey.checkpoint.json',
+                            help='File recording finished ranges, so an interrupted run can resume.')
+
+    def handle(self, *args, **options):
+        self.checkpoint_path = options['checkpoint']
+        self.done = self.load_checkpoint()
+        ranges = list(self.pending_ranges(options['chunk_size']))
+        self.total = 0
+        self.start = time.perf_counter()
+        workers = options['workers']
+
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stderr.write('SQLite allows a single writer at a time; re-encrypting in this process.')
+            workers = 1
+
+        if workers > 1:
+            connections.close_all()
+
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(rekey_range_in_worker, *r, options['batch_size']) for r in ranges]
+
+                for future in as_completed(futures):
+                    self.finish_range(*future.result())
+        else:
+            for r in ranges:
+                self.finish_range(*rekey_range(*r, options['batch_size']))
+
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+        self.stdout.write(self.style.SUCCESS(f'Re-encrypted {self.total} rows in {self.elapsed:.1f}s.'))
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def pending_ranges(self, chunk_size):
+        for label in MODELS:
+            bounds = apps.get_model(label)._base_manager.aggregate(low=Min('pk'), high=Max('pk'))
+
+            if bounds['low'] is None:
+                continue
+
+            for start in range(bounds['low'], bounds['high'] + 1, chunk_size):
+                if [start, start + chunk_size] not in self.done.get(label, []):
+                    yield label, start, start + chunk_size
+
+    def finish_range(self, label, start, end, rotated):
+        self.done.setdefault(label, []).append([start, end])
+        self.save_checkpoint()
+        self.total += rotated
+        self.stdout.write(f'{label} [{start}, {end}): {rotated} rows, {self.total / self.elapsed:.0f} rows/sec')
+
+    def load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return {}
+
+        with open(self.checkpoint_path) as f:
+            return json.load(f)
+
+    def save_checkpoint(self):
+        tmp_path = f'{self.checkpoint_path}.tmp'
+
+        with open(tmp_path, 'w') as f:
+            json.dump(self.done, f)
+
+        os.replace(tmp_path, self.checkpoint_path)
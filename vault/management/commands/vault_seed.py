@@ -0,0 +1,179 @@
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from faker import Factory
+
+from vault.executor import encrypt_many, init_worker as init_crypto_worker
+from vault.models import User, Team, Credential, SecureNote
+
+ALPHABET = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789!@#$%'
+
+# Per process state of the workers, set up once by init_worker from the arguments sent along with every chunk.
+_state = {}
+
+
+def zipf_cum_weights(n, exponent):
+    """
+    Cumulative weights for ``random.choices`` favouring low ranks: rank ``r`` is picked in proportion to 1 / r^s.
+    """
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, n + 1)))
+
+
+def init_worker(user_ids, team_ids, exponent, seed):
+    if _state.get('args') == (user_ids, team_ids, exponent, seed):
+        return
+
+    faker = Factory.create()
+    faker.seed_instance(seed)
+
+    _state.update(
+        args=(user_ids, team_ids, exponent, seed), user_ids=user_ids, team_ids=team_ids, seed=seed,
+        user_weights=zipf_cum_weights(len(user_ids), exponent),
+        team_weights=zipf_cum_weights(len(team_ids), exponent) if team_ids else None,
+        names=[faker.catch_phrase() for _ in range(1000)],
+        texts=[faker.text() for _ in range(200)],
+    )
+
+
+def generate_chunk_in_worker(args, *chunk):
+    # Set up on the first chunk each worker gets rather than with the pool's initializer, which Python 3.6 lacks.
+    init_crypto_worker()
+    init_worker(*args)
+
+    return generate_chunk(*chunk)
+
+
+def generate_chunk(model, start, count, shared):
+    """
+    Rows ``start`` to ``start + count`` of ``model``, with their secrets encrypted, as
+    ``(owner id, team id, name, secret)`` tuples. The same arguments always generate the same rows.
+    """
+    rng = random.Random(_state['seed'] * 1000003 + start)
+    owners = rng.choices(_state['user_ids'], cum_weights=_state['user_weights'], k=count)
+    rows = []
+
+    for i, owner_id in enumerate(owners, start):
+        team_id = None
+
+        if _state['team_ids'] and rng.random() < shared:
+            team_id = rng.choices(_state['team_ids'], cum_weights=_state['team_weights'])[0]
+
+        if model == 'credential':
+            secret = ''.join(rng.choices(ALPHABET, k=20))
+        else:
+            secret = rng.choice(_state['texts'])
+
+        rows.append((owner_id, team_id, f'{rng.choice(_state["names"])} {i}', secret))
+
+    ciphertexts = encrypt_many([secret for _, _, _, secret in rows])
+
+    return model, [row[:3] + (ciphertext,) for row, ciphertext in zip(rows, ciphertexts)]
+
+
+class Command(BaseCommand):
+    help = ('Fill the database with a large synthetic vault: users, teams with skewed membership, credentials '
+            'and secure notes. Secrets are encrypted in worker processes and inserted with bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--teams', type=int, default=100)
+        parser.add_argument('--credentials', type=int, default=100000)
+        parser.add_argument('--notes', type=int, default=10000)
+        parser.add_argument('--shared', type=float, default=0.3,
+                            help='Fraction of credentials and notes shared with a team.')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Zipf exponent of how owners, team sizes and memberships are distributed; '
+                                 '0 spreads them evenly.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Processes encrypting secrets.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows generated and inserted at a time.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same vault.')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(email__startswith='seed-').exists():
+            raise CommandError('The database has been seeded already.')
+
+        rng = random.Random(options['seed'])
+        self.start = time.perf_counter()
+
+        with transaction.atomic():
+            user_ids = self.create_users(options['users'], options['seed'])
+            team_ids = self.create_teams(options['teams'], user_ids, options['skew'], rng)
+
+        chunks = []
+
+        for model, total in [('credential', options['credentials']), ('note', options['notes'])]:
+            chunks += [(model, start, min(options['batch_size'], total - start), options['shared'])
+                       for start in range(0, total, options['batch_size'])]
+
+        initargs = (user_ids, team_ids, options['skew'], options['seed'])
+
+        if options['workers'] > 1:
+            with ProcessPoolExecutor(options['workers']) as executor:
+                self.insert(executor.map(generate_chunk_in_worker, [initargs] * len(chunks), *zip(*chunks))
+                            if chunks else [])
+        else:
+            init_worker(*initargs)
+            self.insert(generate_chunk(*chunk) for chunk in chunks)
+
+        self.stdout.write(self.style.SUCCESS(f'Seeded the vault in {self.elapsed:.1f}s.'))
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def create_users(self, count, seed):
+        faker = Factory.create()
+        faker.seed_instance(seed)
+        password = make_password(None)
+        User.objects.bulk_create(User(email=f'seed-{i}@example.com', first_name=faker.first_name(),
+                                      last_name=faker.last_name(), password=password) for i in range(count))
+        self.stdout.write(f'{count} users')
+
+        return list(User.objects.filter(email__startswith='seed-').order_by('pk').values_list('pk', flat=True))
+
+    def create_teams(self, count, user_ids, skew, rng):
+        """
+        Create teams whose sizes fall off with their rank, filled with users drawn with a Zipf skew too, so a few
+        users belong to many teams and most to one or none.
+        """
+        user_weights = zipf_cum_weights(len(user_ids), skew)
+        Team.objects.bulk_create(Team(owner_id=rng.choice(user_ids), name=f'seed-team-{i}') for i in range(count))
+        team_ids = list(Team.objects.filter(name__startswith='seed-team-').order_by('pk').values_list('pk', flat=True))
+        memberships = []
+
+        for rank, team_id in enumerate(team_ids, 1):
+            size = max(1, int(len(user_ids) * 0.2 / rank ** skew))
+            members = set(rng.choices(user_ids, cum_weights=user_weights, k=size))
+            memberships += [Team.members.through(team_id=team_id, user_id=user_id) for user_id in members]
+
+        Team.members.through.objects.bulk_create(memberships)
+        self.stdout.write(f'{count} teams, {len(memberships)} memberships')
+
+        return team_ids
+
+    def insert(self, chunks):
+        rows = 0
+
+        for model, chunk in chunks:
+            if model == 'credential':
+                objs = [Credential(owner_id=owner_id, team_id=team_id, name=name, username='seed', password=secret)
+                        for owner_id, team_id, name, secret in chunk]
+            else:
+                objs = [SecureNote(owner_id=owner_id, team_id=team_id, title=name, note=secret)
+                        for owner_id, team_id, name, secret in chunk]
+
+            for obj in objs:
+                # Already encrypted by the worker; tells bulk_create_encrypted to leave it alone.
+                obj.stored_secret = obj.password if model == 'credential' else obj.note
+
+            with transaction.atomic():
+                type(objs[0]).objects.bulk_create_encrypted(objs, len(objs))
+
+            rows += len(objs)
+            self.stdout.write(f'{rows} secrets, {rows / self.elapsed:.0f} rows/sec')
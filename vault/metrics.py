@@ -0,0 +1,388 @@
+"""
+A small metrics registry for the vault, served in the Prometheus text format on ``/metrics``.
+
+Every process records into its own registry. With ``VAULT_METRICS_DIR`` set, as when running several gunicorn
+workers, each process also writes a snapshot of its registry to ``<pid>.json`` in that directory, at most once every
+``FLUSH_INTERVAL`` seconds, and ``/metrics`` adds up the snapshots of all of them, whichever worker serves it.
+Snapshots of processes that have exited, or that were not written for ``VAULT_METRICS_STALE_AFTER`` seconds, are
+removed, so the counters of a worker drop out when it goes away, which Prometheus takes as a counter reset.
+"""
+import atexit
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+FLUSH_INTERVAL = 1
+
+LATENCY_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for value in labels.values())
+
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _key(self, labels):
+        self.check_fork()
+
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} takes the labels {", ".join(self.labelnames) or "none"}.')
+
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def values(self):
+        self.check_fork()
+
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def check_fork(self):
+        """
+        Start from zero in a forked child, which would otherwise report its parent's values again as its own.
+        """
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._values = {}
+            self._lock = threading.Lock()
+
+    def merge(self, total, value):
+        return total + value
+
+    def samples(self, key, value):
+        yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    """
+    Counts of observations per bucket, plus their sum, stored as ``[bucket counts..., +Inf count, sum]``.
+    """
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super(Histogram, self).__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            state = self._values.get(key)
+
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+
+            state[index] += 1
+            state[-1] += value
+
+    def values(self):
+        self.check_fork()
+
+        with self._lock:
+            return [[list(key), list(state)] for key, state in self._values.items()]
+
+    def merge(self, total, value):
+        return [a + b for a, b in zip(total, value)]
+
+    def samples(self, key, value):
+        labels = dict(zip(self.labelnames, key))
+        count = 0
+
+        for bound, bucket in zip(self.buckets + ('+Inf',), value):
+            count += bucket
+            yield f'{self.name}_bucket', dict(labels, le=str(bound)), count
+
+        yield f'{self.name}_sum', labels, value[-1]
+        yield f'{self.name}_count', labels, count
+
+
+class CallbackMetric(Metric):
+    """
+    A metric whose values are read from ``callback`` when a snapshot is taken, as ``{label values: value}``.
+    """
+
+    def __init__(self, name, documentation, type, callback, labelnames=()):
+        super(CallbackMetric, self).__init__(name, documentation, labelnames)
+        self.type = type
+        self.callback = callback
+
+    def values(self):
+        return [[list(key), value] for key, value in self.callback().items()]
+
+
+class DerivedMetric(Metric):
+    """
+    A gauge computed from the totals of other metrics once they have been added up across processes, for values such
+    as ratios that cannot be added up themselves.
+    """
+    type = 'gauge'
+
+    def __init__(self, name, documentation, derive, labelnames=()):
+        super(DerivedMetric, self).__init__(name, documentation, labelnames)
+        self.derive = derive
+
+    def values(self):
+        return []
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.last_flush = 0
+        self._pid = os.getpid()
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'A metric named {metric.name} is registered already.')
+
+        self.metrics[metric.name] = metric
+
+        return metric
+
+    def check_fork(self):
+        """
+        Flush a forked child on its own schedule, rather than on the one it inherited from its parent.
+        """
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self.last_flush = 0
+
+    def snapshot(self):
+        self.check_fork()
+
+        return {'pid': os.getpid(), 'metrics': {name: metric.values() for name, metric in self.metrics.items()}}
+
+    def flush(self, force=False):
+        """
+        Write this process' snapshot to ``VAULT_METRICS_DIR``, unless that is unset or it was written less than
+        ``FLUSH_INTERVAL`` seconds ago.
+        """
+        self.check_fork()
+        directory = getattr(settings, 'VAULT_METRICS_DIR', None)
+        now = time.monotonic()
+
+        if not directory or (not force and now - self.last_flush < FLUSH_INTERVAL):
+            return
+
+        self.last_flush = now
+        path = os.path.join(directory, f'{os.getpid()}.json')
+
+        # Readers only ever see whole snapshots: the file is replaced, never written in place.
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(self.snapshot(), f)
+
+        os.replace(f'{path}.tmp', path)
+
+    def discard(self):
+        """
+        Remove this process' snapshot, as it exits.
+        """
+        directory = getattr(settings, 'VAULT_METRICS_DIR', None)
+
+        if directory and self._pid == os.getpid():
+            remove_file(os.path.join(directory, f'{self._pid}.json'))
+
+    def snapshots(self):
+        """
+        The snapshots of all live processes, removing those of processes that exited or stopped writing theirs.
+        """
+        directory = getattr(settings, 'VAULT_METRICS_DIR', None)
+
+        if not directory:
+            return [self.snapshot()]
+
+        self.flush(force=True)
+        stale_after = getattr(settings, 'VAULT_METRICS_STALE_AFTER', 3600)
+        snapshots = []
+
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            pid = os.path.basename(path)[:-len('.json')]
+
+            try:
+                stale = time.time() - os.path.getmtime(path) > stale_after
+            except OSError:
+                continue
+
+            if stale or not pid.isdigit() or not pid_alive(int(pid)):
+                remove_file(path)
+                continue
+
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                # Removed or replaced while being read; the next scrape picks it up again.
+                continue
+
+        return snapshots
+
+    def collect(self):
+        """
+        The values of every metric, added up across the snapshots of all processes, as ``{name: {key: value}}``.
+        """
+        totals = {name: {} for name in self.metrics}
+
+        for snapshot in self.snapshots():
+            for name, values in snapshot['metrics'].items():
+                metric = self.metrics.get(name)
+
+                if metric is None:
+                    continue
+
+                for key, value in values:
+                    key = tuple(key)
+                    total = totals[name].get(key)
+                    totals[name][key] = value if total is None else metric.merge(total, value)
+
+        for name, metric in self.metrics.items():
+            if isinstance(metric, DerivedMetric):
+                totals[name] = metric.derive(totals)
+
+        return totals
+
+    def expose(self):
+        lines = []
+        totals = self.collect()
+
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+
+            for key, value in sorted(totals[name].items()):
+                for sample, labels, number in metric.samples(key, value):
+                    lines.append(f'{sample}{format_labels(labels)} {format_value(number)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def pid_alive(pid):
+    if pid == os.getpid():
+        return True
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+registry = Registry()
+
+crypto_seconds = registry.register(Histogram(
+    'vault_crypto_seconds', 'Time taken by calls encrypting or decrypting secrets.', ['operation']))
+crypto_values = registry.register(Counter(
+    'vault_crypto_values_total', 'Secrets encrypted or decrypted.', ['operation']))
+pbkdf2_seconds = registry.register(Histogram(
+    'vault_pbkdf2_seconds', 'Time taken by PBKDF2 key derivations.', ['purpose'], buckets=(.01, .025, .05, .1, .25,
+                                                                                          .5, 1, 2.5)))
+request_seconds = registry.register(Histogram(
+    'vault_request_seconds', 'Time taken by requests, by URL name.', ['view']))
+request_db_seconds = registry.register(Histogram(
+    'vault_request_db_seconds', 'Time requests spent running SQL queries, by URL name.', ['view']))
+request_queries = registry.register(Histogram(
+    'vault_request_queries', 'SQL queries run by requests, by URL name.', ['view'], buckets=QUERY_BUCKETS))
+admin_requests = registry.register(Counter(
+    'vault_admin_requests_total', 'Requests handled by each ModelAdmin, by URL name.', ['model_admin', 'view']))
+
+
+def register_collectors():
+    """
+    Publish the counters kept by the caches and the crypto executor. Called once the app registry is ready, as both
+    depend on modules that themselves record metrics.
+    """
+    from vault.cache import membership_cache, secret_cache
+    from vault.executor import crypto_executor
+
+    caches = {'membership': membership_cache, 'secret': secret_cache}
+
+    def cache_stat(stat):
+        return lambda: {(name,): cache.stats()[stat] for name, cache in caches.items()}
+
+    def hit_ratio(totals):
+        hits, misses = totals['vault_cache_hits_total'], totals['vault_cache_misses_total']
+
+        return {key: hits[key] / (hits[key] + misses.get(key, 0)) for key in hits if hits[key] + misses.get(key, 0)}
+
+    def executor_stat(stat):
+        return lambda: {(): crypto_executor.stats()[stat]}
+
+    registry.register(CallbackMetric('vault_cache_hits_total', 'Cache lookups answered from the cache.', 'counter',
+                                     cache_stat('hits'), ['cache']))
+    registry.register(CallbackMetric('vault_cache_misses_total', 'Cache lookups that had to load the value.',
+                                     'counter', cache_stat('misses'), ['cache']))
+    registry.register(DerivedMetric('vault_cache_hit_ratio', 'Share of cache lookups answered from the cache.',
+                                    hit_ratio, ['cache']))
+    registry.register(CallbackMetric('vault_crypto_executor_submitted_total', 'Batches given to the crypto executor.',
+                                     'counter', executor_stat('submitted')))
+    registry.register(CallbackMetric('vault_crypto_executor_rejected_total',
+                                     'Batches the crypto executor turned away for being full.', 'counter',
+                                     executor_stat('rejected')))
+    registry.register(CallbackMetric('vault_crypto_executor_pending', 'Batches queued or running in the crypto '
+                                     'executor.', 'gauge', executor_stat('pending')))
+
+
+def metrics_enabled():
+    return getattr(settings, 'VAULT_METRICS', False)
+
+
+def metrics_view(request):
+    if not metrics_enabled():
+        raise Http404
+
+    token = getattr(settings, 'VAULT_METRICS_TOKEN', None)
+
+    if token and not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+
+    return HttpResponse(registry.expose(), content_type=CONTENT_TYPE)
+
+
+atexit.register(registry.discard)
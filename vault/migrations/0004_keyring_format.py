@@ -0,0 +1,37 @@
+from django.db import migrations
+
+from vault.keyring import LEGACY_SEPARATOR, get_keyring
+
+BATCH_SIZE = 500
+
+
+def convert_model(model, field):
+    keyring = get_keyring()
+    rows = model.objects.filter(**{f'{field}__contains': LEGACY_SEPARATOR}).only('pk', field)
+    batch = []
+
+    for obj in rows.iterator(chunk_size=BATCH_SIZE):
+        setattr(obj, field, keyring.rotate(getattr(obj, field)))
+        batch.append(obj)
+
+        if len(batch) == BATCH_SIZE:
+            model.objects.bulk_update(batch, [field])
+            batch = []
+
+    model.objects.bulk_update(batch, [field])
+
+
+def convert_legacy_values(apps, schema_editor):
+    convert_model(apps.get_model('vault', 'Credential'), 'password')
+    convert_model(apps.get_model('vault', 'SecureNote'), 'note')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0003_auto_20190710_1119'),
+    ]
+
+    operations = [
+        migrations.RunPython(convert_legacy_values, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0004_keyring_format'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='credential',
+            index=models.Index(fields=['owner', '-date_created'], name='vault_cred_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='credential',
+            index=models.Index(fields=['team', '-date_created'], name='vault_cred_team_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='credential',
+            index=models.Index(fields=['-date_created'], name='vault_cred_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='credential',
+            index=models.Index(fields=['name'], name='vault_cred_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='securenote',
+            index=models.Index(fields=['owner', '-date_created'], name='vault_note_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='securenote',
+            index=models.Index(fields=['team', '-date_created'], name='vault_note_team_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='securenote',
+            index=models.Index(fields=['-date_created'], name='vault_note_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='securenote',
+            index=models.Index(fields=['title'], name='vault_note_title_idx'),
+        ),
+    ]
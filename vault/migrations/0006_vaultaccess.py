@@ -0,0 +1,45 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+ACCESS = [
+    ('Credential', 'credential', ['owner', 'team__owner', 'team__members']),
+    ('SecureNote', 'note', ['owner', 'team__members']),
+]
+
+
+def populate_access(apps, schema_editor):
+    VaultAccess = apps.get_model('vault', 'VaultAccess')
+
+    for model_name, field, lookups in ACCESS:
+        model = apps.get_model('vault', model_name)
+        grants = {grant for lookup in lookups
+                  for grant in model.objects.filter(**{f'{lookup}__isnull': False}).values_list(lookup, 'pk')}
+        VaultAccess.objects.bulk_create(
+            [VaultAccess(user_id=user_id, **{f'{field}_id': pk}) for user_id, pk in grants], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0005_visibility_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VaultAccess',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('credential', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='access', to='vault.Credential', verbose_name='credential')),
+                ('note', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='access', to='vault.SecureNote', verbose_name='secure note')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vault_access', to='vault.User', verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'vault access',
+                'verbose_name_plural': 'vault access',
+                'unique_together': {('user', 'credential'), ('user', 'note')},
+            },
+        ),
+        migrations.RunPython(populate_access, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:08
+
+from django.db import migrations, models
+
+from vault import search
+
+SEARCH_FIELDS = [('Credential', 'name'), ('SecureNote', 'title')]
+
+
+def populate_search_text(apps, schema_editor):
+    for model_name, field in SEARCH_FIELDS:
+        model = apps.get_model('vault', model_name)
+        objs = []
+
+        for obj in model.objects.select_related('owner').only(
+                'pk', field, 'owner__first_name', 'owner__last_name', 'owner__email').iterator():
+            obj.search_text = search.normalize(
+                getattr(obj, field), obj.owner.first_name, obj.owner.last_name, obj.owner.email)
+            objs.append(obj)
+
+        model.objects.bulk_update(objs, ['search_text'], batch_size=500)
+
+
+def install_search(apps, schema_editor):
+    for model_name, field in SEARCH_FIELDS:
+        search.install(apps.get_model('vault', model_name), schema_editor.connection)
+
+
+def uninstall_search(apps, schema_editor):
+    for model_name, field in SEARCH_FIELDS:
+        search.uninstall(apps.get_model('vault', model_name), schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0006_vaultaccess'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='credential',
+            name='search_text',
+            field=models.TextField(blank=True, editable=False, verbose_name='search text'),
+        ),
+        migrations.AddField(
+            model_name='securenote',
+            name='search_text',
+            field=models.TextField(blank=True, editable=False, verbose_name='search text'),
+        ),
+        migrations.RunPython(populate_search_text, migrations.RunPython.noop),
+        migrations.RunPython(install_search, uninstall_search),
+    ]
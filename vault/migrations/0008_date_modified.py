@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0007_search_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='credential',
+            name='date_modified',
+            field=models.DateTimeField(auto_now=True, verbose_name='date modified'),
+        ),
+        migrations.AddField(
+            model_name='securenote',
+            name='date_modified',
+            field=models.DateTimeField(auto_now=True, verbose_name='date modified'),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='date_modified',
+            field=models.DateTimeField(auto_now=True, verbose_name='date modified'),
+        ),
+    ]
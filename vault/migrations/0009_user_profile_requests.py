@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vault', '0008_date_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_requests',
+            field=models.BooleanField(default=False, help_text='Keep cProfile profiles of the slowest requests of this user.', verbose_name='profile requests'),
+        ),
+    ]
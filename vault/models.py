@@ -2,22 +2,146 @@ from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
-from django.db.models.signals import pre_save
+from django.db.models import Max
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from django.core.validators import MaxLengthValidator
 
-from vault.helpers import encrypt_value, decrypt_value
+from vault.cache import membership_cache, secret_cache
+from vault.pagination import bump_generation
+from vault.helpers import encrypt_value, decrypt_value, encrypt_values, decrypt_values
+from vault.search import normalize
+
+BATCH_SIZE = 1000
+
+
+def saved_fields(sender, update_fields):
+    """
+    The names of the fields a save writes, whether ``update_fields`` gives them by name or attname (``team`` or
+    ``team_id``), or ``None`` when it writes all of them.
+    """
+    if update_fields is None:
+        return None
+
+    return {field.name for field in sender._meta.concrete_fields
+            if field.name in update_fields or field.attname in update_fields}
 
 
 @receiver(pre_save, sender='vault.Credential')
-def encrypt_password(sender, instance=None, **kwargs):
-    instance.password = instance.encrypted_password
+def encrypt_password(sender, instance=None, update_fields=None, **kwargs):
+    if update_fields is None or 'password' in update_fields:
+        instance.password = instance.encrypted_password if instance.secret_changed else instance.stored_secret
+        instance.stored_secret = instance.password
 
 
 @receiver(pre_save, sender='vault.SecureNote')
-def encrypt_note(sender, instance=None, **kwargs):
-    instance.note = instance.encrypted_note
+def encrypt_note(sender, instance=None, update_fields=None, **kwargs):
+    if update_fields is None or 'note' in update_fields:
+        instance.note = instance.encrypted_note if instance.secret_changed else instance.stored_secret
+        instance.stored_secret = instance.note
+
+
+@receiver(pre_save, sender='vault.Credential')
+@receiver(pre_save, sender='vault.SecureNote')
+def update_search_text(sender, instance=None, update_fields=None, **kwargs):
+    fields = saved_fields(sender, update_fields)
+
+    if fields is None or {'owner', sender.search_field} & fields:
+        instance.search_text = instance.get_search_text(instance.owner)
+
+        # A save limited to other fields would leave the new search text behind.
+        if fields is not None and 'search_text' not in fields:
+            sender.objects.filter(pk=instance.pk).update(search_text=instance.search_text)
+
+
+@receiver(post_save, sender='vault.User')
+def update_owner_search_text(sender, instance=None, created=False, **kwargs):
+    # Saves that leave the names and email alone, like logins or password changes, have nothing to rewrite.
+    search_identity, instance.saved_search_identity = instance.saved_search_identity, instance.get_search_identity()
+
+    if not created and search_identity != instance.saved_search_identity:
+        for model in [Credential, SecureNote]:
+            objs = list(model.objects.filter(owner=instance).only('pk', model.search_field))
+
+            for obj in objs:
+                obj.search_text = obj.get_search_text(instance)
+
+            model.objects.bulk_update(objs, ['search_text'], batch_size=BATCH_SIZE)
+            bump_generation(model)
+
+
+@receiver(post_save, sender='vault.Credential')
+@receiver(post_save, sender='vault.SecureNote')
+@receiver(post_delete, sender='vault.Credential')
+@receiver(post_delete, sender='vault.SecureNote')
+def invalidate_changelists(sender, **kwargs):
+    bump_generation(sender)
+
+
+@receiver(post_save, sender='vault.Credential')
+@receiver(post_save, sender='vault.SecureNote')
+@receiver(post_delete, sender='vault.Credential')
+@receiver(post_delete, sender='vault.SecureNote')
+def invalidate_secret_cache(sender, instance=None, **kwargs):
+    secret_cache.invalidate(sender, instance.pk)
+
+
+@receiver(post_save, sender='vault.Credential')
+@receiver(post_save, sender='vault.SecureNote')
+def refresh_access(sender, instance=None, update_fields=None, **kwargs):
+    fields = saved_fields(sender, update_fields)
+
+    if fields is None or {'owner', 'team'} & fields:
+        sender.objects.filter(pk=instance.pk).refresh_access()
+
+
+@receiver(post_save, sender='vault.Team')
+def refresh_team_access(sender, instance=None, created=False, **kwargs):
+    if not created:
+        refresh_teams_access([instance.pk])
+
+
+@receiver(m2m_changed, sender='vault.Team_members')
+def refresh_members_access(sender, instance=None, action=None, reverse=False, pk_set=None, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance.cleared_team_ids = list(instance.team_set.values_list('pk', flat=True))
+    elif action in ['post_add', 'post_remove']:
+        refresh_teams_access(pk_set if reverse else [instance.pk])
+    elif action == 'post_clear':
+        refresh_teams_access(instance.cleared_team_ids if reverse else [instance.pk])
+
+
+@receiver(pre_save, sender='vault.Team')
+@receiver(pre_delete, sender='vault.Team')
+def collect_team_users(sender, instance=None, **kwargs):
+    if instance.pk:
+        instance.previous_users = set(instance.members.values_list('pk', flat=True)) | set(
+            sender.objects.filter(pk=instance.pk).values_list('owner_id', flat=True))
+
+
+@receiver(post_save, sender='vault.Team')
+@receiver(post_delete, sender='vault.Team')
+def invalidate_team_membership(sender, instance=None, **kwargs):
+    membership_cache.invalidate(getattr(instance, 'previous_users', set()) | {instance.owner_id})
+
+
+@receiver(m2m_changed, sender='vault.Team_members')
+def invalidate_members_membership(sender, instance=None, action=None, reverse=False, pk_set=None, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        instance.cleared_member_ids = list(instance.members.values_list('pk', flat=True))
+    elif action in ['post_add', 'post_remove', 'post_clear']:
+        if reverse:
+            membership_cache.invalidate([instance.pk])
+        else:
+            membership_cache.invalidate(pk_set or getattr(instance, 'cleared_member_ids', []))
+
+
+def refresh_teams_access(team_ids):
+    for model in [Credential, SecureNote]:
+        model.objects.filter(team__in=team_ids).refresh_access()
+        bump_generation(model)
 
 
 class UserManager(BaseUserManager):
@@ -54,6 +178,8 @@ class User(AbstractUser):
     username = None
     email = models.EmailField(_('email address'), unique=True,
                               error_messages={'unique': _('A user with that email already exists.')})
+    profile_requests = models.BooleanField(_('profile requests'), default=False,
+                                           help_text=_('Keep cProfile profiles of the slowest requests of this user.'))
 
     objects = UserManager()
 
@@ -61,6 +187,20 @@ class User(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
 
+    # The fields the search text of the user's credentials and notes includes, as last loaded or saved.
+    saved_search_identity = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(User, cls).from_db(db, field_names, values)
+        instance.saved_search_identity = instance.get_search_identity()
+
+        return instance
+
+    def get_search_identity(self):
+        # Deferred fields count as unknown, so saving such an instance rewrites the search text to be safe.
+        return tuple(self.__dict__.get(field) for field in ['first_name', 'last_name', 'email'])
+
     def __str__(self):
         full_name = self.get_full_name()
 
@@ -71,6 +211,7 @@ class Team(models.Model):
     owner = models.ForeignKey('User', on_delete=models.CASCADE, verbose_name=_('owner'), related_name='owner')
     members = models.ManyToManyField('User', verbose_name=_('users'), blank=True, related_name='team_set')
     name = models.CharField(_('name'), max_length=150, unique=True)
+    date_modified = models.DateTimeField(_('date modified'), auto_now=True)
 
     class Meta:
         verbose_name = _('team')
@@ -80,7 +221,167 @@ class Team(models.Model):
         return self.name
 
 
-class Credential(models.Model):
+class SecretQuerySet(models.QuerySet):
+    """
+    Batch counterparts of the pre_save encryption and the ``decrypted_*`` properties.
+
+    ``bulk_create`` and ``bulk_update`` don't send signals, so these encrypt the secrets themselves, a batch at a time
+    and with one keyring for the whole run.
+    """
+
+    def visible_to(self, user):
+        if user.is_superuser:
+            return self
+
+        return self.filter(access__user=user)
+
+    def refresh_access(self):
+        """
+        Recompute the VaultAccess rows of the objects in this queryset.
+        """
+        field = self.model.access_field
+        grants = {grant for lookup in self.model.access_lookups
+                  for grant in self.filter(**{f'{lookup}__isnull': False}).values_list(lookup, 'pk')}
+
+        VaultAccess.objects.filter(**{f'{field}__in': self.values('pk')}).delete()
+        VaultAccess.objects.bulk_create([VaultAccess(user_id=user_id, **{f'{field}_id': pk}) for user_id, pk in grants])
+
+    def _create_batch(self, objs):
+        # Objects whose stored_secret was set to their ciphertext already are inserted as they are.
+        self._encrypt_batch([obj for obj in objs if obj.secret_changed])
+        owners = User.objects.in_bulk({obj.owner_id for obj in objs})
+
+        for obj in objs:
+            obj.search_text = obj.get_search_text(owners[obj.owner_id])
+
+        last_pk = self.aggregate(last_pk=Max('pk'))['last_pk'] or 0
+        created = self.bulk_create(objs)
+
+        # bulk_create sends no post_save, and not every backend reports the new primary keys.
+        self.model.objects.filter(pk__gt=last_pk).refresh_access()
+        bump_generation(self.model)
+
+        return created
+
+    def _encrypt_batch(self, objs):
+        field = self.model.secret_field
+
+        for obj, value in zip(objs, encrypt_values(getattr(obj, field) for obj in objs)):
+            setattr(obj, field, value)
+            obj.stored_secret = value
+
+    def bulk_create_encrypted(self, objs, batch_size=BATCH_SIZE):
+        created = []
+        batch = []
+
+        for obj in objs:
+            batch.append(obj)
+
+            if len(batch) == batch_size:
+                created.extend(self._create_batch(batch))
+                batch = []
+
+        if batch:
+            created.extend(self._create_batch(batch))
+
+        return created
+
+    def bulk_update_encrypted(self, objs, fields, batch_size=BATCH_SIZE):
+        objs = list(objs)
+        field = self.model.secret_field
+
+        if field in fields:
+            self._encrypt_batch([obj for obj in objs if obj.secret_changed])
+            for obj in objs:
+                setattr(obj, field, obj.stored_secret)
+
+        # bulk_update skips auto_now, and clients revalidate against date_modified.
+        now = timezone.now()
+
+        for obj in objs:
+            obj.date_modified = now
+
+        self.bulk_update(objs, list(fields) + ['date_modified'], batch_size=batch_size)
+
+    def decrypt_iter(self, batch_size=BATCH_SIZE):
+        """
+        Yield the objects with their secret field holding the plaintext, fetching ``batch_size`` rows at a time.
+        """
+        field = self.model.secret_field
+        batch = []
+
+        for obj in self.iterator(chunk_size=batch_size):
+            batch.append(obj)
+
+            if len(batch) == batch_size:
+                yield from self._decrypt_batch(batch, field)
+                batch = []
+
+        yield from self._decrypt_batch(batch, field)
+
+    @staticmethod
+    def _decrypt_batch(objs, field):
+        for obj, value in zip(objs, decrypt_values(getattr(obj, field) for obj in objs)):
+            setattr(obj, field, value.decode())
+            yield obj
+
+
+class SecretModel(models.Model):
+    """
+    Base for models keeping one encrypted field, named by ``secret_field``.
+
+    The ciphertext read from the database is kept in ``stored_secret``, so the pre_save receivers only encrypt when
+    the field was given a new plaintext and leave the stored value alone on metadata-only saves.
+    """
+    secret_field = None
+
+    stored_secret = None
+
+    decrypted_secret = None
+
+    objects = SecretQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(SecretModel, cls).from_db(db, field_names, values)
+        instance.stored_secret = instance.__dict__.get(cls.secret_field)
+
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super(SecretModel, self).refresh_from_db(using, fields)
+
+        if fields is None or self.secret_field in fields:
+            self.stored_secret = self.__dict__.get(self.secret_field)
+
+    def decrypt_secret(self, value):
+        # The last value decrypted is remembered, so a save and the admin form around it decrypt the secret once.
+        if self.decrypted_secret is None or self.decrypted_secret[0] != value:
+            self.decrypted_secret = (value, secret_cache.get_or_decrypt(type(self), self.pk, value, decrypt_value))
+
+        return self.decrypted_secret[1]
+
+    def get_search_text(self, owner):
+        return normalize(getattr(self, self.search_field), owner.first_name, owner.last_name, owner.email)
+
+    @property
+    def secret_changed(self):
+        value = getattr(self, self.secret_field)
+
+        if self.stored_secret is None:
+            return True
+
+        if value == self.stored_secret:
+            return False
+
+        # The admin swaps the plaintext in for editing, so an unchanged secret comes back as its own plaintext.
+        return value != self.decrypt_secret(self.stored_secret).decode()
+
+
+class Credential(SecretModel):
     username_validator = UnicodeUsernameValidator()
 
     owner = models.ForeignKey('User', on_delete=models.CASCADE, verbose_name=_('owner'))
@@ -92,6 +393,13 @@ class Credential(models.Model):
     password = models.CharField(_('password'), max_length=254, validators=[MaxLengthValidator(64)])
     url = models.URLField(_('URL'), blank=True)
     date_created = models.DateTimeField(_('date created'), auto_now_add=True)
+    date_modified = models.DateTimeField(_('date modified'), auto_now=True)
+    search_text = models.TextField(_('search text'), blank=True, editable=False)
+
+    secret_field = 'password'
+    search_field = 'name'
+    access_field = 'credential'
+    access_lookups = ['owner', 'team__owner', 'team__members']
 
     def __str__(self):
         return self.name
@@ -99,6 +407,12 @@ class Credential(models.Model):
     class Meta:
         verbose_name = _('credential')
         verbose_name_plural = _('credentials')
+        indexes = [
+            models.Index(fields=['owner', '-date_created'], name='vault_cred_owner_created_idx'),
+            models.Index(fields=['team', '-date_created'], name='vault_cred_team_created_idx'),
+            models.Index(fields=['-date_created'], name='vault_cred_created_idx'),
+            models.Index(fields=['name'], name='vault_cred_name_idx'),
+        ]
 
     @property
     def encrypted_password(self):
@@ -106,15 +420,22 @@ class Credential(models.Model):
 
     @property
     def decrypted_password(self):
-        return decrypt_value(self.password)
+        return self.decrypt_secret(self.password)
 
 
-class SecureNote(models.Model):
+class SecureNote(SecretModel):
     owner = models.ForeignKey('User', on_delete=models.CASCADE, verbose_name=_('owner'))
     team = models.ForeignKey('Team', on_delete=models.CASCADE, null=True, blank=True, verbose_name=_('team'))
     title = models.CharField(_('title'), max_length=150)
     note = models.TextField(_('note'))
     date_created = models.DateTimeField(_('date created'), auto_now_add=True)
+    date_modified = models.DateTimeField(_('date modified'), auto_now=True)
+    search_text = models.TextField(_('search text'), blank=True, editable=False)
+
+    secret_field = 'note'
+    search_field = 'title'
+    access_field = 'note'
+    access_lookups = ['owner', 'team__members']
 
     def __str__(self):
         return self.title
@@ -122,6 +443,12 @@ class SecureNote(models.Model):
     class Meta:
         verbose_name = _('secure note')
         verbose_name_plural = _('secure notes')
+        indexes = [
+            models.Index(fields=['owner', '-date_created'], name='vault_note_owner_created_idx'),
+            models.Index(fields=['team', '-date_created'], name='vault_note_team_created_idx'),
+            models.Index(fields=['-date_created'], name='vault_note_created_idx'),
+            models.Index(fields=['title'], name='vault_note_title_idx'),
+        ]
 
     @property
     def encrypted_note(self):
@@ -129,4 +456,24 @@ class SecureNote(models.Model):
 
     @property
     def decrypted_note(self):
-        return decrypt_value(self.note)
+        return self.decrypt_secret(self.note)
+
+
+class VaultAccess(models.Model):
+    """
+    One row per user and credential or secure note they can see.
+
+    This denormalises the owner/team/membership rules, so visibility is a single indexed lookup instead of an OR over
+    joins. The receivers at the top of this module keep it current; ``vault_rebuild_access`` repairs drift left by
+    writes that bypass signals, such as ``QuerySet.update()``.
+    """
+    user = models.ForeignKey('User', on_delete=models.CASCADE, verbose_name=_('user'), related_name='vault_access')
+    credential = models.ForeignKey('Credential', on_delete=models.CASCADE, null=True, blank=True,
+                                   verbose_name=_('credential'), related_name='access')
+    note = models.ForeignKey('SecureNote', on_delete=models.CASCADE, null=True, blank=True,
+                             verbose_name=_('secure note'), related_name='access')
+
+    class Meta:
+        verbose_name = _('vault access')
+        verbose_name_plural = _('vault access')
+        unique_together = [['user', 'credential'], ['user', 'note']]
@@ -0,0 +1,141 @@
+import hashlib
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+AFTER_VAR = 'after'
+BEFORE_VAR = 'before'
+CURSOR_VARS = [AFTER_VAR, BEFORE_VAR]
+
+
+def generation_key(model):
+    return f'vault:changelist:{model._meta.label_lower}:generation'
+
+
+def new_generation():
+    # A random start rather than 0, so a generation key that was evicted can't come back as one that is still cached.
+    return random.getrandbits(62)
+
+
+def get_generation(model):
+    return cache.get_or_set(generation_key(model), new_generation, None)
+
+
+def bump_generation(model):
+    """
+    Forget the cached counts and page boundaries of every changelist of ``model``.
+    """
+    try:
+        cache.incr(generation_key(model))
+    except ValueError:
+        cache.set(generation_key(model), new_generation(), None)
+
+
+def encode_cursor(obj):
+    return f'{obj.date_created.isoformat()},{obj.pk}'
+
+
+def decode_cursor(value):
+    """
+    The ``(date_created, pk)`` a cursor parameter holds, or ``None`` if it is missing or malformed.
+    """
+    date_created, _, pk = (value or '').rpartition(',')
+
+    try:
+        date_created = parse_datetime(date_created)
+        pk = int(pk)
+    except ValueError:
+        return None
+
+    return (date_created, pk) if date_created else None
+
+
+class KeysetPaginator(Paginator):
+    """
+    Changelist paginator that seeks from a known row instead of using OFFSET.
+
+    A page is fetched as a range scan on the date index, however deep it is, when its boundary is known: from the
+    ``after`` or ``before`` cursor that the links to the neighbouring pages carry (see ``KeysetChangeList``), or from
+    the ``(date_created, pk)`` of the last row of the previous page, which each page served stores in the cache. Pages
+    in the second half are read backwards from the end, so the last one is as cheap as the first; only jumps to
+    pages in the middle use OFFSET, as do querysets not ordered by ``keyset``. Counts are cached as well; both expire
+    after ``VAULT_CHANGELIST_CACHE_TIMEOUT`` seconds or as soon as a row of the model is saved or deleted.
+    """
+    keyset = ('-date_created', '-id')
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, after=None, before=None):
+        super(KeysetPaginator, self).__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.after = after
+        self.before = before
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'VAULT_CHANGELIST_CACHE_TIMEOUT', 60)
+
+    @cached_property
+    def cache_key(self):
+        sql, params = self.object_list.query.sql_with_params()
+        digest = hashlib.md5(repr((sql, params)).encode()).hexdigest()
+        model = self.object_list.model
+
+        return f'vault:changelist:{model._meta.label_lower}:{get_generation(model)}:{digest}'
+
+    @cached_property
+    def keyset_ordered(self):
+        # The changelist adds the ordering of the admin's queryset to its own, so it may come twice.
+        return tuple(dict.fromkeys(self.object_list.query.order_by)) == self.keyset
+
+    @cached_property
+    def count(self):
+        key = f'{self.cache_key}:count'
+        count = cache.get(key)
+
+        if count is None:
+            count = self.object_list.count()
+            cache.set(key, count, self.timeout)
+
+        return count
+
+    def page(self, number):
+        number = self.validate_number(number)
+
+        if not self.keyset_ordered:
+            return super(KeysetPaginator, self).page(number)
+
+        # The rows of the page, counted from the start and from the end, the way Paginator.page() counts them.
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+
+        if top + self.orphans >= self.count:
+            top = self.count
+
+        after = self.after or (cache.get(f'{self.cache_key}:page:{number}') if number > 1 else None)
+
+        if number == 1:
+            object_list = list(self.object_list[:top])
+        elif after:
+            date_created, pk = after
+            object_list = list(self.object_list.filter(
+                Q(date_created__lt=date_created) | Q(date_created=date_created, pk__lt=pk))[:top - bottom])
+        elif self.before:
+            date_created, pk = self.before
+            object_list = list(self.object_list.filter(
+                Q(date_created__gt=date_created) | Q(date_created=date_created, pk__gt=pk)).reverse()[:top - bottom])
+            object_list.reverse()
+        elif self.count - top < bottom:
+            object_list = list(self.object_list.reverse()[self.count - top:self.count - bottom])
+            object_list.reverse()
+        else:
+            object_list = list(self.object_list[bottom:top])
+
+        if object_list:
+            last = object_list[-1]
+            cache.set(f'{self.cache_key}:page:{number + 1}', (last.date_created, last.pk), self.timeout)
+
+        return self._get_page(object_list, number, self)
+
@@ -0,0 +1,127 @@
+"""
+Profiles of individual requests, taken with cProfile by ``ProfilerMiddleware``, and the on-disk store that keeps the
+slowest of them.
+"""
+import io
+import json
+import os
+import pstats
+import re
+import time
+import uuid
+
+from django.conf import settings
+
+PROFILE_ID = re.compile(r'^[0-9a-f]{32}$')
+# The orders a profile can be printed in, the default first.
+SORT_KEYS = ['cumulative', 'tottime', 'calls']
+
+
+class ProfileStore:
+    """
+    The ``keep`` slowest profiles, each stored as ``<id>.prof``, in the format of ``pstats.Stats.dump_stats``, next to
+    ``<id>.json`` describing the request.
+
+    Faster profiles are dropped once the store is full, so it works as a bounded ring buffer ordered by duration
+    rather than by age. Several processes may share the directory.
+    """
+
+    def __init__(self, directory, keep):
+        self.directory = directory
+        self.keep = keep
+
+    def entries(self):
+        """
+        The descriptions of the stored profiles, slowest first.
+        """
+        entries = []
+
+        for name in os.listdir(self.directory) if os.path.isdir(self.directory) else []:
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(self.directory, name)) as f:
+                        entries.append(json.load(f))
+                except (OSError, ValueError):
+                    # Pruned by another process in the meantime.
+                    continue
+
+        return sorted(entries, key=lambda entry: entry['duration'], reverse=True)
+
+    def wants(self, duration):
+        entries = self.entries()
+
+        return len(entries) < self.keep or duration > entries[-1]['duration']
+
+    def save(self, profiler, **description):
+        """
+        Store the profile and return its id, or ``None`` if the store is full of slower ones.
+        """
+        if not self.wants(description['duration']):
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = uuid.uuid4().hex
+        profiler.dump_stats(os.path.join(self.directory, f'{profile_id}.prof'))
+
+        with open(os.path.join(self.directory, f'{profile_id}.json'), 'w') as f:
+            json.dump(dict(description, id=profile_id, date=time.time()), f)
+
+        for entry in self.entries()[self.keep:]:
+            self.delete(entry['id'])
+
+        return profile_id
+
+    def delete(self, profile_id):
+        for extension in ['json', 'prof']:
+            try:
+                os.remove(os.path.join(self.directory, f'{profile_id}.{extension}'))
+            except FileNotFoundError:
+                pass
+
+    def get(self, profile_id):
+        """
+        The description of a stored profile, or ``None``.
+        """
+        if not PROFILE_ID.match(profile_id):
+            return None
+
+        try:
+            with open(os.path.join(self.directory, f'{profile_id}.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def path(self, profile_id):
+        return os.path.join(self.directory, f'{profile_id}.prof')
+
+    def report(self, profile_id, sort=SORT_KEYS[0], limit=50):
+        """
+        The ``limit`` most expensive functions of a stored profile as text, the way ``pstats`` prints them.
+        """
+        stream = io.StringIO()
+        stats = pstats.Stats(self.path(profile_id), stream=stream)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+
+        return stream.getvalue()
+
+
+def get_profile_store():
+    directory = getattr(settings, 'VAULT_PROFILER_DIR', None)
+
+    if not directory:
+        return None
+
+    return ProfileStore(directory, getattr(settings, 'VAULT_PROFILER_KEEP', 20))
+
+
+def should_profile(request):
+    """
+    Requests of users flagged with ``profile_requests``, and those a superuser sends with an ``X-Vault-Profile``
+    header, are profiled.
+    """
+    user = getattr(request, 'user', None)
+
+    if user is None or not user.is_authenticated:
+        return False
+
+    return user.profile_requests or (user.is_superuser and bool(request.META.get('HTTP_X_VAULT_PROFILE')))
@@ -0,0 +1,130 @@
+from django.apps import apps as global_apps
+from django.core.exceptions import FieldDoesNotExist
+from django.db import DatabaseError, connections
+
+SEARCH_MODELS = ['vault.Credential', 'vault.SecureNote']
+
+# Below this length a trigram index can't help, so shorter words fall back to a LIKE on the search column.
+MIN_INDEXED_LENGTH = 3
+
+_fts_tables = set()
+
+
+def normalize(*values):
+    return ' '.join(' '.join(value.split()).lower() for value in values if value)
+
+
+def fts_table(model):
+    return f'{model._meta.db_table}_fts'
+
+
+def has_fts(model, using='default'):
+    connection = connections[using]
+    table = fts_table(model)
+
+    if (using, table) not in _fts_tables and connection.vendor == 'sqlite':
+        if table in connection.introspection.table_names():
+            _fts_tables.add((using, table))
+
+    return (using, table) in _fts_tables
+
+
+def search(queryset, search_term):
+    """
+    Filter ``queryset`` to rows whose ``search_text`` contains every word of ``search_term``.
+
+    Matching goes through the SQLite FTS5 trigram table or the PostgreSQL pg_trgm index set up by ``install``, so
+    it doesn't scan the table or join the owner; other databases run a plain LIKE on ``search_text``.
+    """
+    words = normalize(search_term).split()
+
+    if not words:
+        return queryset
+
+    model = queryset.model
+    fts = has_fts(model, queryset.db)
+    table = fts_table(model)
+
+    for word in words:
+        if fts and len(word) >= MIN_INDEXED_LENGTH:
+            # Wrapping RawSQL in pk__in parenthesises it twice, which SQLite reads as a scalar subquery.
+            where = f'{model._meta.db_table}.id IN (SELECT rowid FROM {table} WHERE {table} MATCH %s)'
+            queryset = queryset.extra(where=[where], params=['"{}"'.format(word.replace('"', '""'))])
+        else:
+            queryset = queryset.filter(search_text__contains=word)
+
+    return queryset
+
+
+def install(model, connection):
+    """
+    Create the search index of ``model`` if it is missing. Safe to run repeatedly.
+
+    On SQLite this is an external content FTS5 table kept in sync by triggers. Django remakes a table (and so drops
+    its triggers) when altering it on SQLite, which is why this runs after every migrate as well.
+    """
+    table = model._meta.db_table
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {table}_search_trgm ON {table} '
+                           f'USING gin (search_text gin_trgm_ops)')
+
+    if connection.vendor != 'sqlite':
+        return
+
+    fts = fts_table(model)
+    triggers = [
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN '
+        f'INSERT INTO {fts}(rowid, search_text) VALUES (new.id, new.search_text); END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, search_text) VALUES ('delete', old.id, old.search_text); END",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF search_text ON {table} BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, search_text) VALUES ('delete', old.id, old.search_text); "
+        f'INSERT INTO {fts}(rowid, search_text) VALUES (new.id, new.search_text); END',
+    ]
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [table])
+        installed = cursor.fetchone()[0] == len(triggers)
+
+        if installed:
+            return
+
+        try:
+            cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                           f"search_text, content='{table}', content_rowid='id', tokenize='trigram')")
+        except DatabaseError:
+            # SQLite without FTS5 or its trigram tokenizer: search falls back to LIKE.
+            return
+
+        for trigger in triggers:
+            cursor.execute(trigger)
+
+        cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def uninstall(model, connection):
+    table = model._meta.db_table
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'DROP INDEX IF EXISTS {table}_search_trgm')
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'DROP TABLE IF EXISTS {fts_table(model)}')
+
+            for suffix in ['insert', 'delete', 'update']:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {fts_table(model)}_{suffix}')
+
+
+def install_all(sender, apps=global_apps, using='default', **kwargs):
+    for label in SEARCH_MODELS:
+        model = apps.get_model(label)
+
+        try:
+            model._meta.get_field('search_text')
+        except FieldDoesNotExist:
+            continue
+
+        install(model, connections[using])
@@ -0,0 +1,84 @@
+from unittest import mock
+
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.test import TestCase
+from faker import Factory
+
+from vault import models
+from vault.models import User, Team, Credential, SecureNote
+
+faker = Factory.create()
+
+
+class LazyDecryptionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email=faker.email(), is_staff=True)
+        self.user.user_permissions.set(Permission.objects.filter(
+            codename__in=['change_credential', 'delete_credential', 'view_credential', 'view_securenote']))
+        self.credential = Credential.objects.create(owner=self.user, name=faker.name(), username='user',
+                                                    password='s3cret')
+        self.client.force_login(self.user)
+
+    def url(self, suffix):
+        return f'/vault/credential/{self.credential.pk}/{suffix}/'
+
+    def test_change_form_shows_plaintext(self):
+        response = self.client.get(self.url('change'))
+
+        self.assertContains(response, 'value="s3cret"')
+
+    def test_delete_and_history_do_not_decrypt(self):
+        with mock.patch.object(models, 'decrypt_value', wraps=models.decrypt_value) as decrypt:
+            self.client.get(self.url('history'))
+            self.client.get(self.url('delete'))
+
+        decrypt.assert_not_called()
+
+    def test_unchanged_secret_is_kept(self):
+        stored = self.credential.password
+        data = {'name': self.credential.name, 'username': 'user', 'password': 's3cret', 'url': ''}
+
+        with mock.patch.object(models, 'decrypt_value', wraps=models.decrypt_value) as decrypt:
+            response = self.client.post(self.url('change'), data)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(decrypt.call_count, 1)
+        self.credential.refresh_from_db()
+
+        self.assertEqual(self.credential.password, stored)
+
+    def test_changed_secret_is_saved(self):
+        data = {'name': self.credential.name, 'username': 'user', 'password': 'n3w', 'url': ''}
+
+        with mock.patch.object(models, 'decrypt_value', wraps=models.decrypt_value) as decrypt:
+            self.client.post(self.url('change'), data)
+
+        self.assertEqual(decrypt.call_count, 1)
+        self.assertEqual(Credential.objects.get().decrypted_password, b'n3w')
+        self.assertContains(self.client.get(self.url('history')), 'Changed Password.')
+
+    def test_reveal(self):
+        response = self.client.get(self.url('reveal'))
+
+        self.assertEqual(response.json(), {'password': 's3cret'})
+
+    def test_reveal_requires_visibility(self):
+        other = User.objects.create(email=faker.email())
+        team = Team.objects.create(owner=other, name=faker.name())
+        note = SecureNote.objects.create(owner=other, team=team, title=faker.name(), note='hidden')
+
+        self.assertEqual(self.client.get(f'/vault/securenote/{note.pk}/reveal/').status_code, 404)
+
+        team.members.add(self.user)
+
+        self.assertEqual(self.client.get(f'/vault/securenote/{note.pk}/reveal/').json(), {'note': 'hidden'})
+
+    def test_view_only_form_masks_secret(self):
+        note = SecureNote.objects.create(owner=self.user, title=faker.name(), note='plain note')
+        response = self.client.get(f'/vault/securenote/{note.pk}/change/')
+
+        self.assertContains(response, f'data-reveal-url="/vault/securenote/{note.pk}/reveal/"')
+        self.assertNotContains(response, note.note)
+        self.assertNotContains(response, 'plain note')
@@ -0,0 +1,56 @@
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.test import TestCase
+from faker import Factory
+
+from vault.models import User, Team, Credential
+
+faker = Factory.create()
+
+
+class TeamPickerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email=faker.email(), is_staff=True)
+        self.user.user_permissions.set(Permission.objects.filter(
+            codename__in=['add_credential', 'change_credential', 'view_credential']))
+        other = User.objects.create(email=faker.email())
+        self.owned = Team.objects.create(owner=self.user, name='alpha owned')
+        self.joined = Team.objects.create(owner=other, name='alpha joined')
+        self.joined.members.add(self.user)
+        self.foreign = Team.objects.create(owner=other, name='alpha foreign')
+        self.client.force_login(self.user)
+
+    def get_autocomplete(self, term, model_name='credential'):
+        return self.client.get('/autocomplete/', {'term': term, 'app_label': 'vault', 'model_name': model_name,
+                                                        'field_name': 'team'})
+
+    def autocomplete(self, term):
+        return {int(result['id']) for result in self.get_autocomplete(term).json()['results']}
+
+    def test_autocomplete_offers_owned_and_joined_teams(self):
+        self.assertEqual(self.autocomplete('alpha'), {self.owned.pk, self.joined.pk})
+        self.assertEqual(self.autocomplete('joined'), {self.joined.pk})
+
+    def test_autocomplete_needs_a_secret_permission(self):
+        self.user.user_permissions.set(Permission.objects.filter(codename='view_credential'))
+
+        self.assertEqual(self.get_autocomplete('alpha').status_code, 403)
+        self.assertEqual(self.get_autocomplete('alpha', model_name='securenote').status_code, 403)
+
+    def test_team_list_shows_owned_teams_only(self):
+        self.user.user_permissions.add(Permission.objects.get(codename='view_team'))
+        response = self.client.get('/vault/team/')
+
+        self.assertEqual(list(response.context['cl'].result_list), [self.owned])
+
+    def test_foreign_team_is_rejected(self):
+        data = {'name': faker.name(), 'username': 'user', 'password': 'secret', 'url': ''}
+
+        response = self.client.post('/vault/credential/add/', dict(data, team=self.foreign.pk))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('team', response.context['adminform'].form.errors)
+
+        response = self.client.post('/vault/credential/add/', dict(data, team=self.joined.pk))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Credential.objects.get().team, self.joined)
@@ -0,0 +1,201 @@
+import base64
+import json
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.test import AsyncClient, TestCase
+from faker import Factory
+
+from vault.executor import CryptoExecutorBusy, crypto_executor
+from vault.models import User, Team, Credential, SecureNote
+
+faker = Factory.create()
+
+
+class ApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email=faker.email(), password='pw', is_staff=True)
+        self.user.user_permissions.set(Permission.objects.filter(
+            codename__in=['view_credential', 'view_securenote', 'view_team']))
+        other = User.objects.create(email=faker.email())
+        self.team = Team.objects.create(owner=other, name=faker.name())
+        self.team.members.add(self.user)
+        self.credentials = [Credential.objects.create(owner=self.user, name=f'cred {i}', username='user',
+                                                      password=f'secret {i}') for i in range(5)]
+        self.shared = SecureNote.objects.create(owner=other, team=self.team, title='shared', note='shared note')
+        self.hidden = Credential.objects.create(owner=other, name='hidden', username='user', password='pw')
+        self.client.force_login(self.user)
+
+    def get_json(self, url, **kwargs):
+        response = self.client.get(url, **kwargs)
+
+        return json.loads(b''.join(response.streaming_content) if response.streaming else response.content)
+
+    def test_requires_authentication(self):
+        self.client.logout()
+
+        self.assertEqual(self.client.get('/api/credentials/').status_code, 401)
+
+    def test_requires_the_admin_permissions(self):
+        self.user.user_permissions.set(Permission.objects.filter(codename='change_credential'))
+
+        self.assertEqual(self.client.get(f'/api/credentials/{self.credentials[0].pk}/').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/notes/{self.shared.pk}/').status_code, 403)
+
+        self.user.is_staff = False
+        self.user.save()
+
+        self.assertEqual(self.client.get(f'/api/credentials/{self.credentials[0].pk}/').status_code, 403)
+
+    def test_basic_auth(self):
+        self.client.logout()
+        auth = base64.b64encode(f'{self.user.email}:pw'.encode()).decode()
+        data = self.get_json('/api/teams/', HTTP_AUTHORIZATION=f'Basic {auth}')
+
+        self.assertEqual([team['id'] for team in data['results']], [self.team.pk])
+
+    def test_list_is_visible_objects_without_secrets(self):
+        data = self.get_json('/api/credentials/')
+
+        self.assertEqual([c['id'] for c in data['results']], [c.pk for c in self.credentials])
+        self.assertNotIn('password', data['results'][0])
+        self.assertEqual(self.get_json('/api/notes/')['results'][0]['title'], 'shared')
+
+    def test_cursor_pagination(self):
+        data = self.get_json('/api/credentials/', data={'limit': 2, 'fields': 'id,password'})
+
+        self.assertEqual(data['results'], [{'id': c.pk, 'password': f'secret {i}'}
+                                           for i, c in enumerate(self.credentials[:2])])
+
+        pages = [data['results']]
+
+        while data['next']:
+            data = self.get_json(data['next'])
+            pages.append(data['results'])
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/credentials/', {'fields': 'id,search_text'})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_detail_decrypts(self):
+        credential = self.credentials[0]
+
+        self.assertEqual(self.get_json(f'/api/credentials/{credential.pk}/')['password'], 'secret 0')
+        self.assertEqual(self.client.get(f'/api/credentials/{self.hidden.pk}/').status_code, 404)
+
+    def test_etag(self):
+        url = f'/api/notes/{self.shared.pk}/'
+        etag = self.client.get(url)['ETag']
+
+        # Session, user, user and group permissions, and the ETag lookup; nothing is read or decrypted for a 304.
+        with self.assertNumQueries(5):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        list_etag = self.client.get('/api/notes/')['ETag']
+        self.assertEqual(self.client.get('/api/notes/', HTTP_IF_NONE_MATCH=list_etag).status_code, 304)
+
+        self.shared.title = 'renamed'
+        self.shared.save()
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get('/api/notes/', HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+
+    def test_list_etag_covers_the_page(self):
+        etag = self.client.get('/api/credentials/', {'limit': 2})['ETag']
+
+        self.credentials[-1].name = 'renamed'
+        self.credentials[-1].save()
+        self.assertEqual(self.client.get('/api/credentials/', {'limit': 2}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.credentials[2].delete()
+        self.assertEqual(self.client.get('/api/credentials/', {'limit': 2}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_losing_access_changes_list_etag(self):
+        etag = self.client.get('/api/notes/')['ETag']
+        self.team.members.remove(self.user)
+
+        self.assertEqual(self.get_json('/api/notes/', HTTP_IF_NONE_MATCH=etag)['results'], [])
+
+
+class CredentialBatchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email=faker.email(), is_staff=True)
+        self.user.user_permissions.set(Permission.objects.filter(codename='view_credential'))
+        other = User.objects.create(email=faker.email())
+        self.credentials = [Credential.objects.create(owner=self.user, name=f'cred {i}', username='user',
+                                                      password=f'secret {i}') for i in range(3)]
+        self.hidden = Credential.objects.create(owner=other, name='hidden', username='user', password='pw')
+        self.client.force_login(self.user)
+
+    def test_fetch_by_ids_and_names(self):
+        ids = f'{self.credentials[0].pk},{self.hidden.pk}'
+
+        # Session, user, user and group permissions, and a single query for the whole batch.
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/credentials/batch/', {'ids': ids, 'names': 'cred 2,missing',
+                                                                   'fields': 'id,password'})
+
+        self.assertEqual(response.json(), {
+            'results': [{'id': self.credentials[0].pk, 'password': 'secret 0'},
+                        {'id': self.credentials[2].pk, 'password': 'secret 2'}],
+            'missing': {'ids': [self.hidden.pk], 'names': ['missing']},
+        })
+
+    def test_busy_executor(self):
+        with self.settings(VAULT_CRYPTO_INLINE_MAX=0), mock.patch.object(crypto_executor, 'submit',
+                                                                          side_effect=CryptoExecutorBusy):
+            response = self.client.get('/api/credentials/batch/', {'names': 'cred 0'})
+
+        self.assertEqual(response.status_code, 503)
+
+    def test_rejects_empty_and_oversized_batches(self):
+        self.assertEqual(self.client.get('/api/credentials/batch/').status_code, 400)
+
+        with self.settings(VAULT_API_BATCH_SIZE=2):
+            response = self.client.get('/api/credentials/batch/', {'names': 'a,b,c'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class AsyncApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email=faker.email(), is_staff=True)
+        self.user.user_permissions.set(Permission.objects.filter(codename='view_credential'))
+        self.credential = Credential.objects.create(owner=self.user, name='cred', username='user', password='s3cret')
+        self.client.force_login(self.user)
+
+    def test_detail(self):
+        response = self.client.get(f'/api/async/credentials/{self.credential.pk}/', {'fields': 'id,password'})
+
+        self.assertEqual(response.json(), {'id': self.credential.pk, 'password': 's3cret'})
+        self.assertEqual(self.client.get(f'/api/async/credentials/{self.credential.pk}/', {'fields': 'id,password'},
+                                         HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_batch(self):
+        response = self.client.get('/api/async/credentials/batch/', {'names': 'cred,missing', 'fields': 'password'})
+
+        self.assertEqual(response.json(), {'results': [{'password': 's3cret'}],
+                                           'missing': {'ids': [], 'names': ['missing']}})
+
+    def test_requires_the_admin_permissions(self):
+        self.user.user_permissions.clear()
+
+        self.assertEqual(self.client.get(f'/api/async/credentials/{self.credential.pk}/').status_code, 403)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(f'/api/async/credentials/{self.credential.pk}/').status_code, 401)
+
+    async def test_asgi(self):
+        client = AsyncClient()
+        await sync_to_async(client.force_login)(self.user)
+        response = await client.get(f'/api/async/credentials/{self.credential.pk}/?fields=password')
+
+        self.assertEqual(response.json(), {'password': 's3cret'})
@@ -0,0 +1,67 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from faker import Factory
+
+from vault import cache, models
+from vault.cache import secret_cache
+from vault.models import User, Credential
+
+faker = Factory.create()
+
+
+@override_settings(VAULT_SECRET_CACHE=True)
+class SecretCacheTest(TestCase):
+    def setUp(self):
+        secret_cache.clear()
+        self.owner = User.objects.create(email=faker.email())
+        self.credential = Credential.objects.create(owner=self.owner, name=faker.name(), username='user',
+                                                    password='s3cret')
+
+    def decrypt(self, credential=None):
+        credential = credential or Credential.objects.get(pk=self.credential.pk)
+
+        with mock.patch.object(models, 'decrypt_value', wraps=models.decrypt_value) as decrypt:
+            self.assertEqual(credential.decrypted_password, b's3cret')
+
+        return decrypt.call_count
+
+    def test_hit_skips_decryption(self):
+        self.assertEqual(self.decrypt(), 1)
+        self.assertEqual(self.decrypt(), 0)
+
+    @override_settings(VAULT_SECRET_CACHE=False)
+    def test_disabled_by_setting(self):
+        self.decrypt()
+
+        self.assertEqual(self.decrypt(), 1)
+
+    def test_entries_expire(self):
+        self.decrypt()
+
+        with mock.patch.object(cache.time, 'monotonic', return_value=cache.time.monotonic() + 60):
+            self.assertEqual(self.decrypt(), 1)
+
+    def test_save_and_delete_invalidate(self):
+        self.decrypt()
+        self.credential.save()
+        self.assertEqual(self.decrypt(), 1)
+
+        self.credential.delete()
+        self.assertEqual(secret_cache.stats()['entries'], 0)
+
+    def test_changed_ciphertext_is_not_served(self):
+        self.decrypt()
+        Credential.objects.filter(pk=self.credential.pk).update(password=models.encrypt_value('s3cret'))
+
+        self.assertEqual(self.decrypt(), 1)
+
+    @override_settings(VAULT_SECRET_CACHE_MAX_BYTES=10)
+    def test_byte_budget_evicts_and_zeroes(self):
+        other = Credential.objects.create(owner=self.owner, name=faker.name(), username='user', password='s3cret')
+        self.decrypt()
+        buffer = secret_cache._entries[secret_cache.key(Credential, self.credential.pk)][2]
+        self.decrypt(Credential.objects.get(pk=other.pk))
+
+        self.assertEqual(buffer, bytearray(6))
+        self.assertEqual(secret_cache.stats()['bytes'], 6)
@@ -0,0 +1,266 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import Group, Permission
+from django.core.management import CommandError, call_command
+from django.test import LiveServerTestCase, TestCase, override_settings
+from django.utils import timezone
+from faker import Factory
+
+from vault.archive import FRAME_HEADER, MAGIC, SALT_SIZE
+from vault.keyring import get_keyring
+from vault.models import User, Team, Credential, SecureNote
+
+faker = Factory.create()
+
+
+def fake_rekey_range(label, start, end, batch_size):
+    return label, start, end, end - start
+
+
+class RekeyCommandTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email=faker.email())
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.tmpdir.name, 'checkpoint.json')
+
+        with override_settings(VAULT_KEYS={'old': 'first'}):
+            self.credentials = [Credential.objects.create(owner=self.user, name=faker.name(), username='user',
+                                                          password=faker.password()) for _ in range(5)]
+            self.note = SecureNote.objects.create(owner=self.user, title=faker.name(), note=faker.text())
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def rekey(self, **options):
+        call_command('vault_rekey', workers=1, chunk_size=2, batch_size=1, checkpoint=self.checkpoint,
+                     stdout=StringIO(), **options)
+
+    @override_settings(VAULT_KEYS={'old': 'first', 'new': 'second'}, VAULT_PRIMARY_KEY_ID='new')
+    def test_rekey(self):
+        self.rekey()
+
+        keyring = get_keyring()
+        for obj in self.credentials:
+            stored = Credential.objects.get(pk=obj.pk)
+            self.assertEqual(keyring.key_id(stored.password), 'new')
+            self.assertEqual(stored.decrypted_password, obj.decrypted_password)
+
+        self.assertEqual(keyring.key_id(SecureNote.objects.get().note), 'new')
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    @override_settings(VAULT_KEYS={'old': 'first', 'new': 'second'}, VAULT_PRIMARY_KEY_ID='new')
+    def test_rekey_resumes_from_checkpoint(self):
+        first = self.credentials[0].pk
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'vault.Credential': [[first, first + 2]]}, f)
+
+        self.rekey()
+
+        key_ids = [get_keyring().key_id(obj.password) for obj in Credential.objects.order_by('pk')]
+        self.assertEqual(key_ids, ['old', 'old', 'new', 'new', 'new'])
+
+    def test_worker_processes(self):
+        # The test database lives in this process' memory, so the workers only run a stand-in for the rekeying; this
+        # covers handing the ranges to the pool and collecting them back.
+        with mock.patch('vault.management.commands.vault_rekey.connection') as connection, \
+                mock.patch('vault.management.commands.vault_rekey.connections'), \
+                mock.patch('vault.management.commands.vault_rekey.rekey_range', fake_rekey_range):
+            connection.vendor = 'postgresql'
+            out = StringIO()
+            call_command('vault_rekey', workers=2, chunk_size=2, checkpoint=self.checkpoint, stdout=out)
+
+        self.assertIn('Re-encrypted 8 rows', out.getvalue())
+
+
+class LoadTestCommandTest(LiveServerTestCase):
+    def test_reports_throughput(self):
+        user = User.objects.create_user(email=faker.email(), password='pw', is_staff=True)
+        user.user_permissions.set(Permission.objects.filter(codename='view_credential'))
+        credential = Credential.objects.create(owner=user, name=faker.name(), username='user', password='pw')
+        url = f'{self.live_server_url}/api/credentials/{credential.pk}/'
+        out = StringIO()
+
+        call_command('vault_loadtest', '--target', f'a={url}', '--target', f'b={url}', user=f'{user.email}:pw',
+                     requests=5, concurrency=1, stdout=out)
+
+        self.assertIn('0 errors', out.getvalue())
+        self.assertIn('b vs a', out.getvalue())
+
+
+@override_settings(VAULT_KEYS={'1': 'first'})
+class ExportImportCommandTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'vault.archive')
+        self.user = User.objects.create_user(email='jane@example.com', password='pw', first_name='Jane')
+        member = User.objects.create(email='john@example.com')
+        self.team = Team.objects.create(owner=self.user, name='ops')
+        self.team.members.add(member)
+        Credential.objects.create(owner=self.user, team=self.team, name='mail', username='user', password='s3cret')
+        SecureNote.objects.create(owner=member, title='wifi', note='hunter2')
+        Credential.objects.update(date_modified=timezone.now() - timedelta(days=1))
+        self.date_created, self.date_modified = Credential.objects.values_list('date_created', 'date_modified').get()
+        group = Group.objects.create(name='auditors')
+        group.permissions.set(Permission.objects.filter(codename='view_credential'))
+        self.user.groups.add(group)
+        self.user.user_permissions.set(Permission.objects.filter(codename='change_credential'))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def clear(self):
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+    def call(self, name, *args, passphrase='correct horse'):
+        with mock.patch.dict(os.environ, {'VAULT_ARCHIVE_PASSPHRASE': passphrase}):
+            call_command(name, *args, stdout=StringIO())
+
+    def test_round_trip(self):
+        self.call('vault_export', self.path, '--chunk-size', '2')
+        self.clear()
+        # Permissions get other ids in another database; they are restored by natural key.
+        permission = Permission.objects.get(codename='view_credential')
+        permission.delete()
+        Permission.objects.create(codename=permission.codename, name=permission.name,
+                                  content_type=permission.content_type)
+
+        with override_settings(VAULT_KEYS={'2': 'second'}):
+            self.call('vault_import', self.path)
+
+            credential = Credential.objects.get()
+            member = User.objects.get(email='john@example.com')
+
+            self.assertEqual(credential.decrypted_password, b's3cret')
+            self.assertTrue(credential.password.startswith('v1$2$'))
+            self.assertEqual(credential.date_created, self.date_created)
+            self.assertEqual(credential.date_modified, self.date_modified)
+            self.assertEqual(SecureNote.objects.get().decrypted_note, b'hunter2')
+            self.assertTrue(User.objects.get(email='jane@example.com').check_password('pw'))
+            self.assertTrue(User.objects.get(email='jane@example.com').has_perms(['vault.view_credential',
+                                                                                  'vault.change_credential']))
+            self.assertEqual(list(Team.objects.get().members.all()), [member])
+            self.assertEqual(list(Credential.objects.visible_to(member)), [credential])
+            self.assertEqual(credential.search_text, 'mail jane jane@example.com')
+
+    def test_wrong_passphrase(self):
+        self.call('vault_export', self.path)
+        self.clear()
+
+        with self.assertRaisesMessage(CommandError, 'Wrong passphrase'):
+            self.call('vault_import', self.path, passphrase='wrong')
+
+        self.assertFalse(User.objects.exists())
+
+    def rewrite_frames(self, change):
+        with open(self.path, 'rb') as f:
+            header = f.read(len(MAGIC) + SALT_SIZE)
+            frames = []
+
+            while True:
+                size, = FRAME_HEADER.unpack(f.read(FRAME_HEADER.size))
+                frames.append(FRAME_HEADER.pack(size) + f.read(size))
+
+                if not size:
+                    break
+
+        with open(self.path, 'wb') as f:
+            f.write(header + b''.join(change(frames)))
+
+    def test_tampered_archives(self):
+        self.call('vault_export', self.path, '--chunk-size', '1')
+        self.clear()
+
+        with open(self.path, 'rb') as f:
+            archive = f.read()
+
+        for change, message in [(lambda frames: frames[:1] + frames[2:], 'missing or out of order'),
+                                (lambda frames: [frames[1], frames[0]] + frames[2:], 'missing or out of order'),
+                                (lambda frames: frames[:-2] + frames[-1:], 'truncated')]:
+            with open(self.path, 'wb') as f:
+                f.write(archive)
+
+            self.rewrite_frames(change)
+
+            with self.assertRaisesMessage(CommandError, message):
+                self.call('vault_import', self.path)
+
+            self.assertFalse(User.objects.exists())
+
+    def test_refuses_non_empty_vault(self):
+        self.call('vault_export', self.path)
+
+        with self.assertRaisesMessage(CommandError, 'not empty'):
+            self.call('vault_import', self.path)
+
+
+class BenchCommandTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmpdir.name, 'bench.json')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def bench(self, **options):
+        call_command('vault_bench', operations=10, writes=2, sizes='20', repeat=1, stdout=StringIO(),
+                     stderr=StringIO(), **options)
+
+    def test_results_are_saved_and_rolled_back(self):
+        self.bench(output=self.output)
+
+        with open(self.output) as f:
+            results = json.load(f)
+
+        self.assertEqual(results['changelist_20_member_queries']['unit'], 'queries')
+        self.assertIn('decrypt_value', results)
+        self.assertFalse(User.objects.exists())
+
+    def test_regressions_fail(self):
+        with open(self.output, 'w') as f:
+            json.dump({'decrypt_value': {'name': 'decrypt_value', 'value': 10 ** 9, 'unit': 'ops/sec',
+                                         'higher_is_better': True}}, f)
+
+        with self.assertRaisesMessage(CommandError, '1 results regressed'):
+            self.bench(suite=['crypto'], baseline=self.output)
+
+
+class SeedCommandTest(TestCase):
+    def seed(self):
+        call_command('vault_seed', users=20, teams=3, credentials=50, notes=10, workers=1, batch_size=20,
+                     stdout=StringIO())
+
+    def test_seed(self):
+        self.seed()
+
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Team.objects.count(), 3)
+        self.assertEqual(Credential.objects.count(), 50)
+        self.assertEqual(SecureNote.objects.count(), 10)
+        self.assertEqual(len(Credential.objects.first().decrypted_password), 20)
+
+        shared = Credential.objects.exclude(team=None).first()
+        member = shared.team.members.first()
+        self.assertIn(shared, Credential.objects.visible_to(member))
+
+        with self.assertRaisesMessage(CommandError, 'seeded already'):
+            self.seed()
+
+    def test_same_seed_gives_the_same_vault(self):
+        self.seed()
+        first = list(User.objects.order_by('email').values_list('email', 'first_name', 'last_name'))
+        names = list(Credential.objects.order_by('name').values_list('name', 'owner__email', 'team__name'))
+        User.objects.all().delete()
+        Team.objects.all().delete()
+
+        call_command('vault_seed', users=20, teams=3, credentials=50, notes=10, workers=2, batch_size=20,
+                     stdout=StringIO())
+
+        self.assertEqual(list(User.objects.order_by('email').values_list('email', 'first_name', 'last_name')), first)
+        self.assertEqual(list(Credential.objects.order_by('name').values_list('name', 'owner__email', 'team__name')),
+                         names)
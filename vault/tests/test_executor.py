@@ -0,0 +1,78 @@
+import threading
+
+from django.test import SimpleTestCase, override_settings
+
+from vault.executor import CryptoExecutor, CryptoExecutorBusy, decrypt_many, encrypt_many
+
+
+def current_thread(values):
+    return [threading.current_thread().name for _ in values]
+
+
+def nested_submit(executors):
+    return executors[0].run(current_thread, [None])
+
+
+@override_settings(VAULT_CRYPTO_INLINE_MAX=0)
+class CryptoExecutorTest(SimpleTestCase):
+    def setUp(self):
+        self.executor = CryptoExecutor()
+        self.addCleanup(self.executor.shutdown)
+
+    def test_round_trip(self):
+        tokens = self.executor.run(encrypt_many, ['a', 'b'])
+
+        self.assertEqual(self.executor.run(decrypt_many, tokens), [b'a', b'b'])
+        self.assertEqual(self.executor.stats()['submitted'], 2)
+        self.assertEqual(self.executor.stats()['pending'], 0)
+
+    def test_runs_off_the_calling_thread(self):
+        self.assertNotEqual(self.executor.run(current_thread, [None]), [threading.current_thread().name])
+
+    @override_settings(VAULT_CRYPTO_EXECUTOR='inline')
+    def test_inline(self):
+        self.assertEqual(self.executor.run(current_thread, [None]), [threading.current_thread().name])
+        self.assertEqual(self.executor.stats()['submitted'], 0)
+
+    @override_settings(VAULT_CRYPTO_INLINE_MAX=1)
+    def test_small_batches_run_inline(self):
+        self.assertEqual(self.executor.run(current_thread, [None]), [threading.current_thread().name])
+        self.assertNotEqual(self.executor.run(current_thread, [None, None]), [threading.current_thread().name] * 2)
+        self.assertEqual(self.executor.stats()['submitted'], 1)
+
+    def test_nested_work_runs_in_the_worker(self):
+        worker = self.executor.run(nested_submit, [self.executor])
+
+        self.assertNotEqual(worker, [threading.current_thread().name])
+        self.assertEqual(self.executor.stats()['submitted'], 1)
+
+    @override_settings(VAULT_CRYPTO_MAX_PENDING=1)
+    def test_back_pressure(self):
+        release = threading.Event()
+        future = self.executor.submit(lambda values: release.wait(), [])
+
+        with self.assertRaises(CryptoExecutorBusy):
+            self.executor.submit(encrypt_many, ['a'], timeout=0.01)
+
+        release.set()
+        future.result()
+
+        self.assertEqual(self.executor.stats()['rejected'], 1)
+        self.assertEqual(len(self.executor.run(encrypt_many, ['a'])), 1)
+
+    @override_settings(VAULT_CRYPTO_EXECUTOR='process', VAULT_CRYPTO_WORKERS=1)
+    def test_process_pool(self):
+        tokens = self.executor.run(encrypt_many, ['a'])
+
+        self.assertEqual(self.executor.run(decrypt_many, tokens), [b'a'])
+
+    def test_forked_child_starts_a_new_pool(self):
+        self.executor.run(encrypt_many, ['a'])
+        pool = self.executor._pool
+        # As seen from a child forked after the pool started.
+        self.executor._pid = -1
+
+        self.assertEqual(self.executor.stats()['submitted'], 0)
+        self.executor.run(encrypt_many, ['a'])
+        self.assertIsNot(self.executor._pool, pool)
+        pool.shutdown()
@@ -0,0 +1,75 @@
+from cryptography.fernet import Fernet
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from faker import Factory
+
+from vault import helpers, keyring
+from vault.keyring import Keyring, UnknownKeyError, get_keyring
+
+faker = Factory.create()
+
+
+class KeyringTest(TestCase):
+    def setUp(self):
+        keyring.clear_keyring_cache()
+
+    def test_keyring_is_built_once(self):
+        self.assertIs(get_keyring(), get_keyring())
+        self.assertEqual(keyring.derive_key.cache_info().misses, 1)
+
+    def test_key_depends_on_key_id(self):
+        self.assertNotEqual(keyring.derive_key('secret', '1'), keyring.derive_key('secret', '2'))
+
+    def test_key_cache_is_bounded(self):
+        for key_id in range(keyring.KEY_CACHE_SIZE + 1):
+            keyring.derive_key('secret', str(key_id))
+
+        self.assertEqual(keyring.derive_key.cache_info().currsize, keyring.KEY_CACHE_SIZE)
+
+    def test_invalid_configuration(self):
+        self.assertRaises(ImproperlyConfigured, Keyring, {'a$b': 'secret'}, 'a$b')
+        self.assertRaises(ImproperlyConfigured, Keyring, {'2024^a': 'secret'}, '2024^a')
+        self.assertRaises(ImproperlyConfigured, Keyring, {'1': 'secret'}, '2')
+
+    def test_stored_format(self):
+        value = get_keyring().encrypt(b'secret')
+        version, key_id, token = value.split('$')
+
+        self.assertEqual(version, keyring.FORMAT_VERSION)
+        self.assertEqual(key_id, '1')
+        self.assertEqual(get_keyring().key_id(value), '1')
+
+    def test_decrypt_legacy_value(self):
+        key = Fernet.generate_key()
+        value = f'{key.decode()}^{Fernet(key).encrypt(b"secret").decode()}'
+
+        self.assertEqual(get_keyring().decrypt(value), b'secret')
+        self.assertTrue(get_keyring().needs_rotation(value))
+        self.assertFalse(get_keyring().needs_rotation(get_keyring().rotate(value)))
+
+    def test_rotation(self):
+        with override_settings(VAULT_KEYS={'old': 'first'}):
+            value = helpers.encrypt_value('secret')
+
+        with override_settings(VAULT_KEYS={'old': 'first', 'new': 'second'}, VAULT_PRIMARY_KEY_ID='new'):
+            self.assertEqual(helpers.decrypt_value(value), b'secret')
+            self.assertTrue(get_keyring().needs_rotation(value))
+
+            rotated = get_keyring().rotate(value)
+            self.assertEqual(get_keyring().key_id(rotated), 'new')
+            self.assertEqual(helpers.decrypt_value(rotated), b'secret')
+
+        with override_settings(VAULT_KEYS={'new': 'second'}):
+            self.assertRaises(UnknownKeyError, helpers.decrypt_value, value)
+
+
+class EncryptValueTest(TestCase):
+    def test_encrypt_and_decrypt(self):
+        value = faker.password()
+
+        self.assertEqual(helpers.decrypt_value(helpers.encrypt_value(value)).decode(), value)
+
+    def test_ciphertexts_are_unique(self):
+        value = faker.password()
+
+        self.assertNotEqual(helpers.encrypt_value(value), helpers.encrypt_value(value))
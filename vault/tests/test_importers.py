@@ -0,0 +1,130 @@
+import io
+import json
+import os
+import tempfile
+import zipfile
+from io import StringIO
+
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from faker import Factory
+
+from vault.importers import (Entry, ImportFormatError, import_credentials, parse_1password, parse_bitwarden, parse_csv,
+                             parse_keepass)
+from vault.models import User, Team, Credential
+
+faker = Factory.create()
+
+CSV = b'''\xef\xbb\xbfTitle,Username,Password,URL
+Mail,jane,s3cret,https://mail.example.com
+VPN,john,hunter2,
+'''
+
+KEEPASS = b'''<?xml version="1.0" encoding="utf-8"?>
+<KeePassFile><Root><Group><Name>Root</Name>
+  <Entry>
+    <String><Key>Title</Key><Value>Mail</Value></String>
+    <String><Key>UserName</Key><Value>jane</Value></String>
+    <String><Key>Password</Key><Value ProtectMemory="True">s3cret</Value></String>
+    <String><Key>URL</Key><Value>https://mail.example.com</Value></String>
+    <History><Entry><String><Key>Title</Key><Value>Old mail</Value></String></Entry></History>
+  </Entry>
+</Group></Root></KeePassFile>
+'''
+
+BITWARDEN = {'items': [
+    {'type': 1, 'name': 'Mail', 'login': {'username': 'jane', 'password': 's3cret',
+                                          'uris': [{'uri': 'https://mail.example.com'}]}},
+    {'type': 2, 'name': 'A secure note'},
+]}
+
+ONEPASSWORD = {'accounts': [{'vaults': [{'items': [
+    {'overview': {'title': 'Mail', 'url': 'https://mail.example.com'},
+     'details': {'loginFields': [{'designation': 'username', 'value': 'jane'},
+                                 {'designation': 'password', 'value': 's3cret'}]}},
+    {'overview': {'title': 'Passport'}, 'details': {'loginFields': []}},
+]}]}]}
+
+MAIL = Entry('Mail', 'jane', 's3cret', 'https://mail.example.com')
+
+
+class ParserTest(TestCase):
+    def test_csv(self):
+        self.assertEqual(list(parse_csv(io.BytesIO(CSV))), [MAIL, Entry('VPN', 'john', 'hunter2', '')])
+
+    def test_keepass(self):
+        self.assertEqual(list(parse_keepass(io.BytesIO(KEEPASS))), [MAIL])
+
+    def test_bitwarden(self):
+        self.assertEqual(list(parse_bitwarden(io.BytesIO(json.dumps(BITWARDEN).encode()))), [MAIL])
+
+    def test_1password(self):
+        data = json.dumps(ONEPASSWORD).encode()
+        archive = io.BytesIO()
+
+        with zipfile.ZipFile(archive, 'w') as f:
+            f.writestr('export.data', data)
+
+        self.assertEqual(list(parse_1password(io.BytesIO(data))), [MAIL])
+        self.assertEqual(list(parse_1password(archive)), [MAIL])
+
+    def test_invalid_files(self):
+        for parse, data, message in [
+            (parse_csv, 'Name,Password\nCafé,pw\n'.encode('latin-1'), 'UTF-8'),
+            (parse_csv, b'Name,Password\n"' + b'a' * 200000 + b'",pw\n', 'Invalid CSV'),
+            (parse_keepass, b'<KeePassFile>', 'Invalid KeePass XML'),
+            (parse_bitwarden, b'[]', 'Not a Bitwarden JSON export'),
+            (parse_bitwarden, b'{"items": [1]}', 'Not a Bitwarden JSON export'),
+            (parse_1password, b'{"accounts": {"vaults": 1}}', 'Not a 1Password export'),
+        ]:
+            with self.subTest(message=message), self.assertRaisesMessage(ImportFormatError, message):
+                list(parse(io.BytesIO(data)))
+
+
+class ImportCredentialsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(email=faker.email(), is_staff=True)
+
+    def test_invalid_entries_are_skipped(self):
+        entries = [MAIL, Entry('Bad', 'not valid!', 'x' * 65, 'not a url'), Entry('VPN', 'john', 'hunter2', '')]
+        created, errors = import_credentials(iter(entries), self.owner, batch_size=1)
+
+        self.assertEqual(created, 2)
+        self.assertEqual([number for number, messages in errors], [2])
+        self.assertEqual(len(errors[0][1]), 3)
+        self.assertEqual(sorted(c.decrypted_password for c in Credential.objects.all()), [b'hunter2', b's3cret'])
+        self.assertEqual(len(Credential.objects.visible_to(self.owner)), 2)
+
+    def test_command(self):
+        team = Team.objects.create(owner=self.owner, name='ops')
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'export.csv')
+
+            with open(path, 'wb') as f:
+                f.write(CSV)
+
+            call_command('vault_import_credentials', path, owner=self.owner.email, team='ops', stdout=StringIO())
+
+        self.assertEqual(Credential.objects.filter(owner=self.owner, team=team).count(), 2)
+
+    def test_admin_upload(self):
+        self.owner.user_permissions.set(Permission.objects.filter(codename__in=['add_credential',
+                                                                                'view_credential']))
+        self.client.force_login(self.owner)
+        upload = SimpleUploadedFile('export.xml', KEEPASS)
+        response = self.client.post('/vault/credential/import/', {'file': upload})
+
+        self.assertRedirects(response, '/vault/credential/')
+        self.assertEqual(Credential.objects.get(owner=self.owner).decrypted_password, b's3cret')
+
+    def test_admin_upload_rejects_unknown_format(self):
+        self.owner.user_permissions.set(Permission.objects.filter(codename='add_credential'))
+        self.client.force_login(self.owner)
+        response = self.client.post('/vault/credential/import/', {'file': SimpleUploadedFile('export.txt', CSV)})
+
+        self.assertContains(response, 'Cannot tell the format')
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+from django.contrib.admin.sites import site
+from django.db import connection
+from django.test import TestCase
+from faker import Factory
+
+from vault.models import User, Team, Credential, SecureNote
+
+faker = Factory.create()
+
+
+class VisibilityIndexTest(TestCase):
+    """
+    Check with EXPLAIN that the admin's query shapes are served by the indexes from 0005_visibility_indexes.
+    """
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                # The test tables are tiny, so the planner would otherwise always pick a sequential scan.
+                cursor.execute('SET enable_seqscan = off')
+
+        self.user = User.objects.create(email=faker.email())
+        self.team = Team.objects.create(owner=self.user, name=faker.name())
+        self.team.members.add(self.user)
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan, f'{index} is not used by:\n{plan}')
+
+    def test_changelist_ordering(self):
+        self.assertUsesIndex(Credential.objects.order_by('-date_created'), 'vault_cred_created_idx')
+        self.assertUsesIndex(SecureNote.objects.order_by('-date_created'), 'vault_note_created_idx')
+
+    def test_date_hierarchy(self):
+        self.assertUsesIndex(Credential.objects.filter(date_created__year=2019), 'vault_cred_created_idx')
+        self.assertUsesIndex(SecureNote.objects.filter(date_created__year=2019), 'vault_note_created_idx')
+
+    def test_owner_and_team(self):
+        self.assertUsesIndex(Credential.objects.filter(owner=self.user).order_by('-date_created'),
+                             'vault_cred_owner_created_idx')
+        self.assertUsesIndex(Credential.objects.filter(team=self.team).order_by('-date_created'),
+                             'vault_cred_team_created_idx')
+
+    def test_name_and_title(self):
+        self.assertUsesIndex(Credential.objects.filter(name='name'), 'vault_cred_name_idx')
+        self.assertUsesIndex(SecureNote.objects.filter(title='title'), 'vault_note_title_idx')
+
+    def test_visibility(self):
+        request = SimpleNamespace(user=self.user)
+
+        self.assertUsesIndex(site._registry[Credential].get_queryset(request),
+                             'vault_vaultaccess_user_id_credential_id_35af4e20_uniq')
+        self.assertUsesIndex(site._registry[SecureNote].get_queryset(request),
+                             'vault_vaultaccess_user_id_note_id_b841c89b_uniq')
@@ -0,0 +1,128 @@
+import json
+import os
+import tempfile
+
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from faker import Factory
+
+from vault.metrics import CallbackMetric, Counter, Histogram, Registry
+from vault.models import User, Credential
+
+faker = Factory.create()
+
+
+class RegistryTest(TestCase):
+    def setUp(self):
+        self.registry = Registry()
+        self.requests = self.registry.register(Counter('requests_total', 'Requests.', ['view']))
+        self.latency = self.registry.register(Histogram('latency_seconds', 'Latency.', buckets=(.1, 1)))
+        self.pending = self.registry.register(CallbackMetric('pending', 'Pending.', 'gauge', lambda: {(): 3}))
+
+    def test_expose(self):
+        self.requests.inc(view='say "hi"')
+        self.requests.inc(2, view='say "hi"')
+        self.latency.observe(.05)
+        self.latency.observe(.5)
+        self.latency.observe(5)
+
+        lines = self.registry.expose().splitlines()
+
+        self.assertIn('# TYPE requests_total counter', lines)
+        self.assertIn('requests_total{view="say \\"hi\\""} 3', lines)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{le="1"} 2', lines)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 3', lines)
+        self.assertIn('latency_seconds_sum 5.55', lines)
+        self.assertIn('latency_seconds_count 3', lines)
+        self.assertIn('pending 3', lines)
+
+    def test_forked_child_starts_from_zero(self):
+        self.requests.inc(view='a')
+        # As seen from a child forked after the count was taken.
+        self.requests._pid = -1
+        self.requests.inc(view='a')
+
+        self.assertEqual(self.requests.values(), [[['a'], 1]])
+
+    def test_labels_are_checked(self):
+        with self.assertRaises(ValueError):
+            self.requests.inc()
+
+    def test_forked_child_flushes_on_its_own_schedule(self):
+        with tempfile.TemporaryDirectory() as tmpdir, override_settings(VAULT_METRICS_DIR=tmpdir):
+            self.registry.flush()
+            os.remove(os.path.join(tmpdir, f'{os.getpid()}.json'))
+            # As seen from a child forked right after its parent flushed.
+            self.registry._pid = -1
+            self.registry.flush()
+
+            self.assertTrue(os.path.exists(os.path.join(tmpdir, f'{os.getpid()}.json')))
+
+    def test_snapshots_of_all_processes_are_added_up(self):
+        self.requests.inc(view='a')
+
+        with tempfile.TemporaryDirectory() as tmpdir, override_settings(VAULT_METRICS_DIR=tmpdir):
+            with open(os.path.join(tmpdir, f'{os.getppid()}.json'), 'w') as f:
+                json.dump({'pid': os.getppid(), 'metrics': {'requests_total': [[['a'], 4]], 'pending': [[[], 5]],
+                                                            'latency_seconds': [[[], [1, 0, 0, .01]]]}}, f)
+
+            totals = self.registry.collect()
+
+            self.assertTrue(os.path.exists(os.path.join(tmpdir, f'{os.getpid()}.json')))
+
+        self.assertEqual(totals['requests_total'], {('a',): 5})
+        self.assertEqual(totals['pending'], {(): 8})
+        self.assertEqual(totals['latency_seconds'], {(): [1, 0, 0, .01]})
+
+    def test_snapshots_of_exited_or_stale_processes_are_removed(self):
+        self.requests.inc(view='a')
+
+        with tempfile.TemporaryDirectory() as tmpdir, override_settings(VAULT_METRICS_DIR=tmpdir,
+                                                                         VAULT_METRICS_STALE_AFTER=60):
+            exited = os.path.join(tmpdir, f'{2 ** 22 + 1}.json')
+            stale = os.path.join(tmpdir, f'{os.getppid()}.json')
+
+            for path in (exited, stale):
+                with open(path, 'w') as f:
+                    json.dump({'pid': 0, 'metrics': {'requests_total': [[['a'], 4]], 'pending': [[[], 5]]}}, f)
+
+            os.utime(stale, (0, 0))
+            totals = self.registry.collect()
+
+            self.assertFalse(os.path.exists(exited))
+            self.assertFalse(os.path.exists(stale))
+
+        self.assertEqual(totals['requests_total'], {('a',): 1})
+        self.assertEqual(totals['pending'], {(): 3})
+
+
+class MetricsViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email=faker.email(), is_staff=True)
+        self.user.user_permissions.set(Permission.objects.filter(codename='view_credential'))
+        Credential.objects.create(owner=self.user, name=faker.name(), username='user', password=faker.password())
+
+    def test_disabled(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+    @override_settings(VAULT_METRICS=True, VAULT_METRICS_TOKEN='token')
+    def test_metrics(self):
+        self.client.force_login(self.user)
+        self.client.get('/vault/credential/')
+        Credential.objects.get().decrypted_password
+
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer token')
+        content = response.content.decode()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('vault_admin_requests_total{model_admin="CredentialAdmin",'
+                      'view="admin:vault_credential_changelist"} 1', content)
+        self.assertIn('vault_request_db_seconds_count{view="admin:vault_credential_changelist"} 1', content)
+        self.assertIn('vault_crypto_seconds_count{operation="decrypt"}', content)
+        self.assertIn('vault_cache_hits_total{cache="membership"}', content)
+        self.assertIn('vault_pbkdf2_seconds_count{purpose="keyring"}', content)
@@ -0,0 +1,159 @@
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory, override_settings
+from faker import Factory
+
+from vault.cache import membership_cache
+from vault.instrumentation import get_metrics
+from vault.middleware import TeamMembership, TeamMembershipMiddleware
+from vault.models import User, Team, Credential
+
+faker = Factory.create()
+
+
+class TeamMembershipTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email=faker.email())
+        self.owned = Team.objects.create(owner=self.user, name=faker.name())
+        self.joined = Team.objects.create(owner=User.objects.create(email=faker.email()), name=faker.name())
+        self.joined.members.add(self.user)
+        self.owned.members.add(self.user)
+        Team.objects.create(owner=self.joined.owner, name=faker.name())
+
+    def test_team_ids_are_looked_up_once(self):
+        membership = TeamMembership(self.user)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(membership.team_ids, {self.owned.pk, self.joined.pk})
+            self.assertEqual(membership.owned_team_ids, {self.owned.pk})
+            self.assertEqual(membership.team_ids, {self.owned.pk, self.joined.pk})
+
+    def test_team_ids_are_cached_across_requests(self):
+        TeamMembership(self.user).team_ids
+        hits = membership_cache.hits
+
+        with self.assertNumQueries(0):
+            self.assertEqual(TeamMembership(self.user).team_ids, {self.owned.pk, self.joined.pk})
+
+        self.assertEqual(membership_cache.hits, hits + 1)
+        self.assertGreater(membership_cache.stats()['hit_ratio'], 0)
+
+    def assertTeamIds(self, user, team_ids):
+        self.assertEqual(TeamMembership(user).team_ids, set(team_ids))
+
+    def test_member_changes_invalidate(self):
+        other = User.objects.create(email=faker.email())
+        self.assertTeamIds(other, [])
+
+        self.joined.members.add(other)
+        self.assertTeamIds(other, [self.joined.pk])
+
+        self.joined.members.remove(other)
+        self.assertTeamIds(other, [])
+
+        other.team_set.add(self.owned)
+        self.assertTeamIds(other, [self.owned.pk])
+
+        other.team_set.clear()
+        self.assertTeamIds(other, [])
+
+        self.assertTeamIds(self.user, [self.owned.pk, self.joined.pk])
+        self.joined.members.clear()
+        self.assertTeamIds(self.user, [self.owned.pk])
+
+    def test_team_changes_invalidate(self):
+        previous_owner = self.joined.owner
+        other = User.objects.create(email=faker.email())
+        self.assertTeamIds(other, [])
+        self.assertEqual(len(TeamMembership(previous_owner).team_ids), 2)
+
+        self.joined.owner = other
+        self.joined.save()
+        self.assertTeamIds(other, [self.joined.pk])
+        self.assertEqual(len(TeamMembership(previous_owner).team_ids), 1)
+        self.assertTeamIds(self.user, [self.owned.pk, self.joined.pk])
+
+        self.joined.delete()
+        self.assertTeamIds(other, [])
+        self.assertTeamIds(self.user, [self.owned.pk])
+
+    def test_middleware(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+
+        TeamMembershipMiddleware(lambda request: None)(request)
+
+        self.assertEqual(request.team_membership.team_ids, {self.owned.pk, self.joined.pk})
+
+
+class AdminQueryCountTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email=faker.email(), is_staff=True)
+        self.user.user_permissions.set(Permission.objects.filter(
+            codename__in=['add_credential', 'change_credential', 'view_credential']))
+        team = Team.objects.create(owner=self.user, name=faker.name())
+        team.members.add(self.user)
+        self.credentials = [Credential.objects.create(owner=self.user, team=team, name=faker.name(),
+                                                      username='user', password=faker.password()) for _ in range(5)]
+        self.client.force_login(self.user)
+        ContentType.objects.clear_cache()
+
+    def test_changelist(self):
+        with self.assertNumQueries(9):
+            self.client.get('/vault/credential/')
+
+    def test_change_form(self):
+        with self.assertNumQueries(11):
+            self.client.get(f'/vault/credential/{self.credentials[0].pk}/change/')
+
+    def test_change_form_with_cached_membership(self):
+        self.client.get('/vault/credential/add/')
+        ContentType.objects.clear_cache()
+
+        with self.assertNumQueries(10):
+            self.client.get(f'/vault/credential/{self.credentials[0].pk}/change/')
+
+    def test_add_form(self):
+        with self.assertNumQueries(8):
+            self.client.get('/vault/credential/add/')
+
+
+class InstrumentationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email=faker.email(), is_staff=True)
+        self.user.user_permissions.set(Permission.objects.filter(codename='change_credential'))
+        self.credential = Credential.objects.create(owner=self.user, name=faker.name(), username='user',
+                                                    password=faker.password())
+        self.client.force_login(self.user)
+
+    @override_settings(VAULT_INSTRUMENTATION_SAMPLE_RATE=1)
+    def test_sampled_request(self):
+        with self.assertLogs('vault.instrumentation') as logs:
+            response = self.client.get(f'/vault/credential/{self.credential.pk}/change/')
+
+        metrics = logs.records[0].metrics
+        self.assertEqual(metrics['view'], 'admin:vault_credential_change')
+        self.assertEqual(metrics['model_admin'], 'CredentialAdmin')
+        self.assertEqual(metrics['status'], 200)
+        self.assertGreater(metrics['queries'], 0)
+        self.assertEqual(metrics['crypto_ops'], 1)
+        self.assertIn(f'desc="{metrics["queries"]} queries"', response['Server-Timing'])
+        self.assertIsNone(get_metrics())
+
+    @override_settings(VAULT_INSTRUMENTATION_SAMPLE_RATE=1)
+    def test_no_server_timing_for_other_users(self):
+        self.client.logout()
+
+        with self.assertLogs('vault.instrumentation'):
+            response = self.client.get('/login/')
+
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_unsampled_request(self):
+        response = self.client.get('/vault/credential/')
+
+        self.assertFalse(response.has_header('Server-Timing'))
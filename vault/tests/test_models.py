@@ -1,3 +1,7 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
 from faker import Factory
 
@@ -18,7 +22,7 @@ class UserModelTest(TestCase):
 class UserManagerTest(TestCase):
     def setUp(self):
         self.user_obj_with_email = User.objects.create_user(email=faker.email())
-        self.superuser_obj = User.objects.create_superuser(email=faker.email(), password=faker.random_number)
+        self.superuser_obj = User.objects.create_superuser(email=faker.email(), password=faker.password())
 
     def test_create_user_without_email(self):
         self.assertRaises(ValueError, User.objects.create_user, email='')
@@ -27,11 +31,11 @@ class UserManagerTest(TestCase):
         self.assertTrue(isinstance(self.user_obj_with_email, User))
 
     def test_create_superuser_with_is_staff_false(self):
-        self.assertRaises(ValueError, User.objects.create_superuser, email=faker.email(), password=faker.random_number,
+        self.assertRaises(ValueError, User.objects.create_superuser, email=faker.email(), password=faker.password(),
                           is_staff=False)
 
     def test_create_superuser_with_is_superuser_false(self):
-        self.assertRaises(ValueError, User.objects.create_superuser, email=faker.email(), password=faker.random_number,
+        self.assertRaises(ValueError, User.objects.create_superuser, email=faker.email(), password=faker.password(),
                           is_superuser=False)
 
     def test_create_superuser(self):
@@ -42,20 +46,205 @@ class CredentialModelTest(TestCase):
     def setUp(self):
         user = User.objects.create(email=faker.email())
         self.obj = Credential.objects.create(owner=user, name=faker.name(), username=faker.name(),
-                                             password=faker.random_number)
+                                             password=str(faker.random_number()))
         self.obj.save()
 
     def test_secure_note_creation(self):
         self.assertTrue(isinstance(self.obj, Credential))
         self.assertEqual(self.obj.__str__(), self.obj.name)
 
+    def test_save_without_changes_keeps_ciphertext(self):
+        obj = Credential.objects.get(pk=self.obj.pk)
+        ciphertext = obj.password
+        obj.name = faker.name()
+
+        with mock.patch('vault.models.encrypt_value') as encrypt_value:
+            obj.save()
+
+        encrypt_value.assert_not_called()
+        self.assertEqual(Credential.objects.get(pk=obj.pk).password, ciphertext)
+
+    def test_save_with_unchanged_plaintext_keeps_ciphertext(self):
+        obj = Credential.objects.get(pk=self.obj.pk)
+        ciphertext = obj.password
+        obj.password = obj.decrypted_password.decode()
+        obj.save()
+
+        self.assertEqual(Credential.objects.get(pk=obj.pk).password, ciphertext)
+
+    def test_save_with_new_plaintext_encrypts(self):
+        obj = Credential.objects.get(pk=self.obj.pk)
+        password = faker.password()
+        obj.password = password
+        obj.save()
+
+        self.assertEqual(Credential.objects.get(pk=obj.pk).decrypted_password.decode(), password)
+
+    def test_save_with_deferred_secret(self):
+        obj = Credential.objects.defer('password').get(pk=self.obj.pk)
+        obj.name = faker.name()
+        obj.save()
+        obj.password
+
+        self.assertEqual(obj.stored_secret, self.obj.password)
+        self.assertEqual(Credential.objects.get(pk=obj.pk).password, self.obj.password)
+
 
 class SecureNoteModelTest(TestCase):
     def setUp(self):
         user = User.objects.create(email=faker.email())
-        self.obj = SecureNote.objects.create(owner=user, title=faker.name(), note=faker.text())
+        self.note = faker.text()
+        self.obj = SecureNote.objects.create(owner=user, title=faker.name(), note=self.note)
         self.obj.save()
 
     def test_secure_note_creation(self):
         self.assertTrue(isinstance(self.obj, SecureNote))
         self.assertEqual(self.obj.__str__(), self.obj.title)
+
+    def test_save_twice_does_not_encrypt_twice(self):
+        self.assertEqual(SecureNote.objects.get(pk=self.obj.pk).decrypted_note.decode(), self.note)
+
+    def test_save_with_update_fields_skips_encryption(self):
+        self.obj.title = faker.name()
+
+        with mock.patch('vault.models.encrypt_value') as encrypt_value:
+            self.obj.save(update_fields=['title'])
+
+        encrypt_value.assert_not_called()
+
+
+class SecretQuerySetTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email=faker.email())
+        self.passwords = [faker.password() for _ in range(5)]
+
+    def create_credentials(self):
+        return Credential.objects.bulk_create_encrypted(
+            (Credential(owner=self.user, name=faker.name(), username='user', password=password)
+             for password in self.passwords), batch_size=2)
+
+    def test_bulk_create_encrypted(self):
+        self.create_credentials()
+
+        self.assertEqual([obj.decrypted_password.decode() for obj in Credential.objects.order_by('pk')],
+                         self.passwords)
+
+    def test_decrypt_iter(self):
+        self.create_credentials()
+
+        with self.assertNumQueries(1):
+            passwords = [obj.password for obj in Credential.objects.order_by('pk').decrypt_iter(batch_size=2)]
+
+        self.assertEqual(passwords, self.passwords)
+
+    def test_bulk_update_encrypted(self):
+        self.create_credentials()
+        objs = list(Credential.objects.order_by('pk').decrypt_iter())
+        objs[0].password = 'changed'
+        date_modified = objs[0].date_modified
+
+        Credential.objects.bulk_update_encrypted(objs, ['name', 'password'])
+
+        self.assertEqual([obj.password for obj in Credential.objects.order_by('pk').decrypt_iter()],
+                         ['changed'] + self.passwords[1:])
+        self.assertGreater(Credential.objects.order_by('pk').first().date_modified, date_modified)
+
+    def test_secure_note_decrypt_iter(self):
+        SecureNote.objects.bulk_create_encrypted([SecureNote(owner=self.user, title='title', note='note')])
+
+        self.assertEqual([obj.note for obj in SecureNote.objects.decrypt_iter()], ['note'])
+
+
+class VaultAccessTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(email=faker.email())
+        self.team_owner = User.objects.create(email=faker.email())
+        self.member = User.objects.create(email=faker.email())
+        self.stranger = User.objects.create(email=faker.email())
+        self.team = Team.objects.create(owner=self.team_owner, name=faker.name())
+        self.team.members.add(self.member)
+        self.credential = Credential.objects.create(owner=self.owner, team=self.team, name=faker.name(),
+                                                    username='user', password=faker.password())
+        self.note = SecureNote.objects.create(owner=self.owner, team=self.team, title=faker.name(), note=faker.text())
+
+    def visible(self, model, user):
+        return set(model.objects.visible_to(user))
+
+    def test_visibility(self):
+        self.assertEqual(self.visible(Credential, self.owner), {self.credential})
+        self.assertEqual(self.visible(Credential, self.team_owner), {self.credential})
+        self.assertEqual(self.visible(Credential, self.member), {self.credential})
+        self.assertEqual(self.visible(Credential, self.stranger), set())
+        self.assertEqual(self.visible(SecureNote, self.owner), {self.note})
+        self.assertEqual(self.visible(SecureNote, self.team_owner), set())
+        self.assertEqual(self.visible(SecureNote, self.member), {self.note})
+
+    def test_superuser_sees_everything(self):
+        self.stranger.is_superuser = True
+
+        self.assertEqual(self.visible(Credential, self.stranger), {self.credential})
+
+    def test_membership_changes(self):
+        self.team.members.add(self.stranger)
+        self.assertEqual(self.visible(Credential, self.stranger), {self.credential})
+
+        self.team.members.remove(self.stranger)
+        self.assertEqual(self.visible(Credential, self.stranger), set())
+
+        self.stranger.team_set.add(self.team)
+        self.assertEqual(self.visible(SecureNote, self.stranger), {self.note})
+
+        self.stranger.team_set.clear()
+        self.assertEqual(self.visible(SecureNote, self.stranger), set())
+
+        self.team.members.clear()
+        self.assertEqual(self.visible(Credential, self.member), set())
+
+    def test_team_owner_change(self):
+        self.team.owner = self.stranger
+        self.team.save()
+
+        self.assertEqual(self.visible(Credential, self.stranger), {self.credential})
+        self.assertEqual(self.visible(Credential, self.team_owner), set())
+
+    def test_credential_changes(self):
+        self.credential.team = None
+        self.credential.save()
+        self.assertEqual(self.visible(Credential, self.member), set())
+
+        self.credential.owner = self.stranger
+        self.credential.save()
+        self.assertEqual(self.visible(Credential, self.stranger), {self.credential})
+        self.assertEqual(self.visible(Credential, self.owner), set())
+
+    def test_update_fields_by_attname(self):
+        team = Team.objects.create(owner=self.team_owner, name=faker.name())
+        team.members.add(self.stranger)
+        self.credential.team_id = team.pk
+        self.credential.save(update_fields=['team_id'])
+
+        self.assertEqual(self.visible(Credential, self.stranger), {self.credential})
+        self.assertEqual(self.visible(Credential, self.member), set())
+
+        self.credential.owner_id = self.stranger.pk
+        self.credential.save(update_fields=['owner_id'])
+
+        self.assertEqual(self.visible(Credential, self.owner), set())
+        self.assertIn(self.stranger.email, Credential.objects.get(pk=self.credential.pk).search_text)
+
+    def test_bulk_create_encrypted(self):
+        Credential.objects.bulk_create_encrypted(
+            [Credential(owner=self.stranger, team=self.team, name=faker.name(), username='user', password='pw')])
+
+        self.assertEqual(len(self.visible(Credential, self.stranger)), 1)
+        self.assertEqual(len(self.visible(Credential, self.member)), 2)
+
+    def test_rebuild_access(self):
+        Credential.objects.update(team=None)
+        VaultAccess.objects.all().delete()
+
+        call_command('vault_rebuild_access', stdout=StringIO())
+
+        self.assertEqual(self.visible(Credential, self.owner), {self.credential})
+        self.assertEqual(self.visible(Credential, self.member), set())
+        self.assertEqual(self.visible(SecureNote, self.member), {self.note})
@@ -0,0 +1,127 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.admin.views.main import PAGE_VAR, SEARCH_VAR
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from faker import Factory
+
+from vault.admin import CredentialAdmin
+from vault.models import User, Credential
+from vault.pagination import (KeysetPaginator, bump_generation, decode_cursor, encode_cursor, generation_key,
+                              get_generation)
+
+faker = Factory.create()
+
+
+class KeysetPaginatorTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create(email=faker.email())
+        now = timezone.now()
+        Credential.objects.bulk_create_encrypted([
+            Credential(owner=self.owner, name=faker.name(), username='user', password=faker.password())
+            for _ in range(25)])
+
+        # Give pairs of rows the same timestamp so the pk tie-breaker matters.
+        for i, credential in enumerate(Credential.objects.order_by('pk')):
+            Credential.objects.filter(pk=credential.pk).update(date_created=now - timedelta(minutes=i // 2))
+
+    def paginator(self):
+        return KeysetPaginator(Credential.objects.order_by('-date_created', '-id'), 10)
+
+    def test_pages_match_offset(self):
+        expected = list(Credential.objects.order_by('-date_created', '-id'))
+        paginator = self.paginator()
+        pages = [list(paginator.page(number)) for number in paginator.page_range]
+
+        self.assertEqual(pages, [expected[:10], expected[10:20], expected[20:]])
+
+    def test_next_page_seeks(self):
+        self.paginator().page(1)
+
+        with CaptureQueriesContext(connection) as queries:
+            list(self.paginator().page(2))
+
+        self.assertTrue(all('OFFSET' not in query['sql'] for query in queries.captured_queries))
+
+    def expected(self):
+        return list(Credential.objects.order_by('-date_created', '-id'))
+
+    def assertNoOffset(self, queries):
+        self.assertTrue(all('OFFSET' not in query['sql'] for query in queries.captured_queries))
+
+    def test_pages_match_offset_without_cached_boundaries(self):
+        expected = self.expected()
+
+        for number, rows in [(2, expected[10:20]), (3, expected[20:])]:
+            cache.clear()
+            self.assertEqual(list(self.paginator().page(number)), rows)
+
+    def test_last_page_is_read_from_the_end(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(list(self.paginator().page(3)), self.expected()[20:])
+
+        self.assertNoOffset(queries)
+
+    def test_cursors_seek(self):
+        expected = self.expected()
+        after = KeysetPaginator(Credential.objects.order_by('-date_created', '-id'), 10,
+                                after=decode_cursor(encode_cursor(expected[9])))
+        before = KeysetPaginator(Credential.objects.order_by('-date_created', '-id'), 10,
+                                 before=decode_cursor(encode_cursor(expected[20])))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(list(after.page(2)), expected[10:20])
+            self.assertEqual(list(before.page(2)), expected[10:20])
+
+        self.assertNoOffset(queries)
+        self.assertIsNone(decode_cursor('yesterday,1'))
+
+    def test_changelist_links_carry_cursors(self):
+        expected = self.expected()
+        self.client.force_login(User.objects.create_superuser(email=faker.email(), password=None))
+
+        with mock.patch.object(CredentialAdmin, 'list_per_page', 10):
+            cl = self.client.get('/vault/credential/').context['cl']
+            link = cl.get_query_string({PAGE_VAR: 2})
+            cache.clear()
+
+            with CaptureQueriesContext(connection) as queries:
+                cl = self.client.get(f'/vault/credential/{link}').context['cl']
+
+            self.assertEqual(cl.result_list, expected[10:20])
+            self.assertNoOffset(queries)
+            self.assertIn('after=', cl.get_query_string({PAGE_VAR: 3}))
+            self.assertIn('before=', self.client.get('/vault/credential/?p=3').context['cl'].get_query_string(
+                {PAGE_VAR: 2}))
+            self.assertNotIn('after=', cl.get_query_string({PAGE_VAR: 1}))
+            self.assertNotIn('after=', cl.get_query_string({SEARCH_VAR: 'mail'}))
+
+    def test_generation_is_fresh_after_eviction(self):
+        generation = get_generation(Credential)
+        cache.delete(generation_key(Credential))
+        bump_generation(Credential)
+
+        self.assertNotIn(get_generation(Credential), [0, generation, generation + 1])
+
+    def test_count_is_cached(self):
+        self.assertEqual(self.paginator().count, 25)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.paginator().count, 25)
+
+    def test_changes_invalidate(self):
+        self.assertEqual(self.paginator().count, 25)
+        Credential.objects.create(owner=self.owner, name=faker.name(), username='user', password=faker.password())
+
+        self.assertEqual(self.paginator().count, 26)
+
+    def test_other_ordering_uses_offset(self):
+        paginator = KeysetPaginator(Credential.objects.order_by('name'), 10)
+        expected = list(Credential.objects.order_by('name'))
+
+        self.assertEqual(list(paginator.page(2)), expected[10:20])
@@ -0,0 +1,115 @@
+import cProfile
+import os
+import pstats
+import tempfile
+
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from faker import Factory
+
+from vault.models import User, Credential
+from vault.profiler import ProfileStore, get_profile_store
+
+faker = Factory.create()
+
+
+class ProfileStoreTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = ProfileStore(self.tmpdir.name, keep=2)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def save(self, duration):
+        profiler = cProfile.Profile()
+        profiler.runcall(sum, range(10))
+
+        return self.store.save(profiler, duration=duration, path='/')
+
+    def test_slowest_profiles_are_kept(self):
+        self.save(1)
+        slowest = self.save(3)
+        self.save(2)
+
+        self.assertEqual([entry['duration'] for entry in self.store.entries()], [3, 2])
+        self.assertIsNone(self.save(.5))
+        self.assertEqual(len(os.listdir(self.tmpdir.name)), 4)
+        self.assertEqual(self.store.get(slowest)['duration'], 3)
+        self.assertIn('function calls', self.store.report(slowest))
+
+    def test_ids_are_checked(self):
+        self.assertIsNone(self.store.get('../secret'))
+
+
+class ProfilerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.settings = override_settings(VAULT_PROFILER_DIR=self.tmpdir.name)
+        self.settings.enable()
+        self.superuser = User.objects.create_superuser(email=faker.email(), password=None)
+        self.user = User.objects.create_user(email=faker.email(), is_staff=True)
+        self.user.user_permissions.set(Permission.objects.filter(codename='view_credential'))
+        Credential.objects.create(owner=self.user, name=faker.name(), username='user', password=faker.password())
+
+    def tearDown(self):
+        self.settings.disable()
+        self.tmpdir.cleanup()
+
+    def profiles(self):
+        return get_profile_store().entries()
+
+    def test_superuser_header(self):
+        self.client.force_login(self.superuser)
+        self.assertFalse(self.client.get('/vault/credential/').has_header('X-Vault-Profile'))
+
+        response = self.client.get('/vault/credential/', HTTP_X_VAULT_PROFILE='1')
+        profile, = self.profiles()
+
+        self.assertEqual(response['X-Vault-Profile'], profile['id'])
+        self.assertEqual(profile['view'], 'admin:vault_credential_changelist')
+        self.assertEqual(profile['user'], self.superuser.email)
+
+    def test_header_is_ignored_for_other_users(self):
+        self.client.force_login(self.user)
+        self.client.get('/vault/credential/', HTTP_X_VAULT_PROFILE='1')
+
+        self.assertEqual(self.profiles(), [])
+
+    def test_flagged_user(self):
+        self.user.profile_requests = True
+        self.user.save()
+        self.client.force_login(self.user)
+        response = self.client.get('/vault/credential/')
+
+        self.assertFalse(response.has_header('X-Vault-Profile'))
+        self.assertEqual(self.profiles()[0]['model_admin'], 'CredentialAdmin')
+
+    def test_admin_pages(self):
+        self.client.force_login(self.superuser)
+        self.client.get('/vault/credential/', HTTP_X_VAULT_PROFILE='1')
+        profile_id = self.profiles()[0]['id']
+
+        self.assertContains(self.client.get('/vault/user/profiles/'), f'/vault/user/profiles/{profile_id}/')
+        self.assertContains(self.client.get(f'/vault/user/profiles/{profile_id}/?sort=tottime'), 'function calls')
+        self.assertEqual(self.client.get('/vault/user/profiles/0123/').status_code, 404)
+
+        response = self.client.get(f'/vault/user/profiles/{profile_id}/download/')
+        path = os.path.join(self.tmpdir.name, 'download.prof')
+
+        with open(path, 'wb') as f:
+            f.writelines(response.streaming_content)
+
+        self.assertGreater(pstats.Stats(path).total_calls, 0)
+
+    def test_admin_pages_are_for_superusers(self):
+        self.user.user_permissions.add(Permission.objects.get(codename='change_user'))
+        self.client.force_login(self.user)
+
+        self.assertEqual(self.client.get('/vault/user/profiles/').status_code, 403)
+        self.assertNotContains(self.client.get(f'/vault/user/{self.user.pk}/change/'), 'profile_requests')
+
+        self.client.force_login(self.superuser)
+        self.assertContains(self.client.get(f'/vault/user/{self.user.pk}/change/'), 'profile_requests')
@@ -0,0 +1,82 @@
+from django.db import connection
+from django.test import TestCase
+from faker import Factory
+
+from vault import search
+from vault.models import User, Credential, SecureNote
+
+faker = Factory.create()
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(email='jane.doe@example.com', first_name='Jane', last_name='Doe')
+        other = User.objects.create(email='john@example.org', first_name='John', last_name='Roe')
+        self.mail = Credential.objects.create(owner=self.owner, name='Mail Server', username='user', password='pw')
+        self.vpn = Credential.objects.create(owner=other, name='Office VPN', username='user', password='pw')
+        self.note = SecureNote.objects.create(owner=self.owner, title='Wifi Password', note=faker.text())
+
+    def search(self, model, term):
+        return set(search.search(model.objects.all(), term))
+
+    def test_search_text(self):
+        self.assertEqual(self.mail.search_text, 'mail server jane doe jane.doe@example.com')
+
+    def test_search_by_name_and_owner(self):
+        self.assertEqual(self.search(Credential, 'SERVER'), {self.mail})
+        self.assertEqual(self.search(Credential, 'jane.doe@'), {self.mail})
+        self.assertEqual(self.search(Credential, 'Roe'), {self.vpn})
+        self.assertEqual(self.search(Credential, 'example'), {self.mail, self.vpn})
+        self.assertEqual(self.search(SecureNote, 'wifi doe'), {self.note})
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.search(Credential, 'vpn jane'), set())
+
+    def test_short_words(self):
+        self.assertEqual(self.search(Credential, 'vp'), {self.vpn})
+
+    def test_updates(self):
+        self.mail.name = 'Backup Server'
+        self.mail.save()
+        self.assertEqual(self.search(Credential, 'backup'), {self.mail})
+        self.assertEqual(self.search(Credential, 'mail server'), set())
+
+        self.owner.last_name = 'Smith'
+        self.owner.save()
+        self.assertEqual(self.search(Credential, 'smith'), {self.mail})
+        self.assertEqual(self.search(SecureNote, 'smith'), {self.note})
+
+        self.mail.delete()
+        self.assertEqual(self.search(Credential, 'smith'), set())
+
+    def test_unrelated_user_changes_leave_search_text_alone(self):
+        owner = User.objects.get(pk=self.owner.pk)
+        owner.set_password('new password')
+        owner.is_active = False
+
+        with self.assertNumQueries(1):
+            owner.save()
+
+        owner.email = 'jane@example.com'
+        owner.save()
+        self.assertEqual(self.search(Credential, 'jane@example.com'), {self.mail})
+
+    def test_bulk_create_encrypted(self):
+        Credential.objects.bulk_create_encrypted(
+            [Credential(owner=self.owner, name='Build Cache', username='user', password='pw')])
+
+        self.assertEqual(len(self.search(Credential, 'build jane')), 1)
+
+    def test_uses_index(self):
+        plan = search.search(Credential.objects.all(), 'server').explain()
+
+        if connection.vendor == 'sqlite':
+            self.assertIn('vault_credential_fts', plan)
+            self.assertNotIn('vault_user', plan)
+
+    def test_admin_search(self):
+        self.client.force_login(User.objects.create_superuser(email=faker.email(), password='password'))
+
+        response = self.client.get('/vault/credential/', {'q': 'jane server'})
+
+        self.assertEqual(list(response.context['cl'].result_list), [self.mail])
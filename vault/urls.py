@@ -0,0 +1,19 @@
+from django.urls import path
+
+from vault import api, async_api
+
+app_name = 'vault-api'
+
+urlpatterns = [
+    path('credentials/', api.CredentialListView.as_view(), name='credential-list'),
+    path('credentials/batch/', api.CredentialBatchView.as_view(), name='credential-batch'),
+    path('credentials/<int:pk>/', api.CredentialDetailView.as_view(), name='credential-detail'),
+    path('notes/', api.SecureNoteListView.as_view(), name='securenote-list'),
+    path('notes/<int:pk>/', api.SecureNoteDetailView.as_view(), name='securenote-detail'),
+    path('teams/', api.TeamListView.as_view(), name='team-list'),
+    path('teams/<int:pk>/', api.TeamDetailView.as_view(), name='team-detail'),
+    # Under ASGI these keep slow lookups from holding a worker; under WSGI they run like the views above.
+    path('async/credentials/batch/', async_api.credential_batch, name='async-credential-batch'),
+    path('async/credentials/<int:pk>/', async_api.credential_detail, name='async-credential-detail'),
+]
+